@@ -71,4 +71,33 @@ def app():
 
 
         with col2:
-            st.metric("Total Profit", f"Rp.{total_profit:,.0f}")
\ No newline at end of file
+            st.metric("Total Profit", f"Rp.{total_profit:,.0f}")
+
+    st.divider()
+    
+    st.markdown('#### Sensitivity Analysis')
+    
+    sweep_variables = model.sweep_variables()
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+    
+        var_one = st.selectbox("Select Variable 1", sweep_variables, index=1)
+        
+        var_one_increment = st.number_input("Set Increment for Var 1", value=10, step=1)
+        
+    with col2:
+        var_two = st.selectbox("Select Variable 2", sweep_variables, index=2)
+        
+        var_two_increment = st.number_input("Set Increment for Var 2", value=10, step=1)
+        
+    st.caption('The heatmap shows the net profit, i.e. after event costs. Cost components are set to the same value for every treatment, the other variables follow the parameters above')
+    
+    fig_sensitivity_analysis, sensitivity_analysis_df = model.run_sensitivity_analysis(
+        [var_one, var_two], [var_one_increment, var_two_increment], price_df=edited_prices,
+        total_event_cost=total_event_cost, event_frequency=event_frequency, metric='Net Profit')
+    
+    st.dataframe(sensitivity_analysis_df, hide_index=True, use_container_width=True)
+    
+    st.plotly_chart(fig_sensitivity_analysis)
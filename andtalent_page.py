@@ -1,10 +1,12 @@
+import os
 import streamlit as st
 import pandas as pd
+from data_registry import PACKAGE_ROOT, output_path
 
 def app():
     # Title and Description
     st.title("Talent Dashboard")
-    st.image("andtalent_logo.png", width=500)
+    st.image(os.path.join(PACKAGE_ROOT, "andtalent_logo.png"), width=500)
 
     st.write("**Hiring Minimum Hour a Week**: Total cumulative hours per week in accomodating client needs, irrespective the number of dentist composing the total hours")
     st.write("**Fee per Hour per Dentist (Rp.)**: Fee per hour per dentist that client needs to pay")
@@ -14,4 +16,4 @@ def app():
 
     if st.button("Update Price List to Client"):
         st.success("Price List Updated to Client")
-        hiring_df.to_csv('andtalent_pricing.csv', index=False)
\ No newline at end of file
+        hiring_df.to_csv(output_path('andtalent_pricing.csv'), index=False)
\ No newline at end of file
@@ -2,117 +2,267 @@ import pandas as pd
 import plotly.graph_objects as go
 import numpy as np
 
+# Resampling frequencies of dated cashflows. Offset objects are used instead of aliases such as
+# 'M'/'ME' or 'Q'/'QE', which were renamed in pandas 2.2
+RESAMPLE_OFFSETS = {
+    'weekly': pd.offsets.Week(weekday=6),
+    'monthly': pd.offsets.MonthEnd(),
+    'quarterly': pd.offsets.QuarterEnd(),
+    'yearly': pd.offsets.YearEnd()
+}
+
+
+def month_end_dates(start_date, periods):
+    """
+    Last day of the month of each monthly period (1 = the month start_date falls in), as datetime64[ns].
+    """
+    start_month = np.datetime64(pd.Timestamp(start_date).strftime('%Y-%m'), 'M')
+    months = start_month + (np.asarray(periods, dtype='int64') - 1)
+    return ((months + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')).astype('datetime64[ns]')
+
+
+class ConsolidatedCashflow:
+    """
+    Cashflows of all companies aligned on the union of their periods (or dates), as dense arrays:
+    revenue[c, p] and expense[c, p] hold company c's amounts in periods[p] (0 where the company has
+    no such period), and present[c, p] tells whether it has one. key is 'Period' or 'Date'.
+    """
+    def __init__(self, companies, periods, revenue, expense, present, key='Period'):
+        self.companies = companies
+        self.periods = periods
+        self.revenue = revenue
+        self.expense = expense
+        self.present = present
+        self.key = key
+        
+        # Totals of all companies per period
+        self.total_revenue = revenue.sum(axis=0)
+        self.total_expense = expense.sum(axis=0)
+    
+    @classmethod
+    def from_frames(cls, collection_df, key='Period'):
+        """
+        Consolidate {company name: DataFrame with Revenue and Expense columns and the key column} in one pass:
+        all rows are stacked once and summed into their (company, period) cell with a single bincount.
+        """
+        companies = list(collection_df.keys())
+        frames = list(collection_df.values())
+        
+        for company_name, df in collection_df.items():
+            if key not in df.columns:
+                raise ValueError(f"Company '{company_name}' has no {key} column. Add it with a Date column or a start_date.")
+        
+        row_periods = np.concatenate([df[key].to_numpy() for df in frames])
+        row_companies = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+        
+        periods = np.unique(row_periods)
+        cells = row_companies * len(periods) + np.searchsorted(periods, row_periods)
+        shape = (len(companies), len(periods))
+        
+        def dense(column):
+            values = np.concatenate([df[column].to_numpy(dtype=float) for df in frames])
+            return np.bincount(cells, weights=np.nan_to_num(values), minlength=shape[0] * shape[1]).reshape(shape)
+        
+        present = (np.bincount(cells, minlength=shape[0] * shape[1]) > 0).reshape(shape)
+        
+        return cls(companies, periods, dense('Revenue'), dense('Expense'), present, key)
+    
+    def resample(self, frequency):
+        """
+        Dated cashflow summed into 'weekly', 'monthly', 'quarterly' or 'yearly' buckets, labelled by their
+        last day. All companies are resampled at once on the consolidated arrays.
+        """
+        if self.key != 'Date':
+            raise ValueError("Only cashflows consolidated by Date can be resampled.")
+        if frequency not in RESAMPLE_OFFSETS:
+            raise ValueError(f"Invalid frequency '{frequency}'. Must be one of {list(RESAMPLE_OFFSETS)}.")
+        
+        # One column per company, so a single resample covers every company
+        index = pd.DatetimeIndex(self.periods)
+        offset = RESAMPLE_OFFSETS[frequency]
+        revenue = pd.DataFrame(self.revenue.T, index=index).resample(offset).sum()
+        expense = pd.DataFrame(self.expense.T, index=index).resample(offset).sum()
+        present = pd.DataFrame(self.present.T.astype(int), index=index).resample(offset).sum() > 0
+        
+        return ConsolidatedCashflow(self.companies, revenue.index.to_numpy(), revenue.to_numpy().T,
+                                    expense.to_numpy().T, present.to_numpy().T, key='Date')
+
+
 class ModelCashflow:
     def __init__(self):
         # Initialize an empty dictionary to hold dataframes for different companies
         self.collection_df = {}
+        
+        # Consolidated cashflows of collection_df by key, built on first use and shared by the combine and plot steps
+        self._consolidated = {}
 
-    def add_company_data(self, company_name, df):
+    def add_company_data(self, company_name, df, start_date=None):
         """
         Adds a new company's cashflow dataframe to the collection.
         :param company_name: Name of the company (string).
-        :param df: Dataframe containing Period, Revenue, Expense columns.
+        :param df: Dataframe containing Revenue and Expense columns, and a monthly Period column, a Date column or both.
+                   Without Period, periods are counted in months from the first Date.
+        :param start_date: Date the company's program starts. Period 1 is then dated at the end of that month,
+                           Period 2 at the end of the next one, and so on, replacing any Date column.
         """
         # Check if the dataframe has the correct columns
-        if not {'Period', 'Revenue', 'Expense'}.issubset(df.columns):
-            raise ValueError("Dataframe must contain 'Period', 'Revenue', and 'Expense' columns.")
+        if not {'Revenue', 'Expense'}.issubset(df.columns) or not {'Period', 'Date'} & set(df.columns):
+            raise ValueError("Dataframe must contain 'Revenue' and 'Expense' columns and a 'Period' or 'Date' column.")
+        
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date']).astype('datetime64[ns]')
+        
+        if 'Period' not in df.columns:
+            months = df['Date'].to_numpy().astype('datetime64[M]')
+            df['Period'] = (months - months.min()).astype('int64') + 1
         
         # Ensure Period is treated as integer values for plotting
         df['Period'] = df['Period'].astype(int)
         
+        if start_date is not None:
+            df['Date'] = month_end_dates(start_date, df['Period'])
+        
         # Add company data to collection
         self.collection_df[company_name] = df
+        self._consolidated = {}
         
-    def combine_and_average(self):
+    def consolidated(self, key='Period'):
         """
-        Combines all DataFrames in collection_df by summing up their Revenue and Expense columns.
-        Returns the average total revenue and average total expense across all periods.
+        The ConsolidatedCashflow of all added companies by 'Period' or by 'Date', computed once until companies change.
         """
         if not self.collection_df:
             raise ValueError("No company data has been added.")
         
-        # Combine all DataFrames on Period by summing Revenues and Expenses
-        combined_df = pd.DataFrame(columns=['Period', 'Total Revenue', 'Total Expense'])
-        
-        for company, df in self.collection_df.items():
-            if combined_df.empty:
-                combined_df = df.copy()
-                combined_df.rename(columns={'Revenue': 'Total Revenue', 'Expense': 'Total Expense'}, inplace=True)
-            else:
-                # Merge on Period and sum Revenue and Expense
-                combined_df = pd.merge(combined_df, df, on='Period', how='outer', suffixes=('', '_drop'))
-                combined_df['Total Revenue'] += combined_df['Revenue'].fillna(0)
-                combined_df['Total Expense'] += combined_df['Expense'].fillna(0)
-                
-                # Drop the additional columns created by the merge
-                combined_df.drop(columns=['Revenue', 'Expense'], inplace=True)
-        
-        # Sort by Period
-        combined_df.sort_values(by='Period', inplace=True)
-        
-        # Calculate total revenue and total expense
-        total_revenue_sum = combined_df['Total Revenue'].sum()
-        total_expense_sum = combined_df['Total Expense'].sum()
-        
-        # Calculate the average total revenue and total expense
-        period_count = combined_df['Period'].nunique()
-        avg_total_revenue = total_revenue_sum / period_count
-        avg_total_expense = total_expense_sum / period_count
+        if key not in self._consolidated:
+            self._consolidated[key] = ConsolidatedCashflow.from_frames(self.collection_df, key)
+        return self._consolidated[key]
+    
+    def _view(self, frequency=None):
+        # Cashflow by Period, or by Date resampled to the given frequency
+        if frequency is None:
+            return self.consolidated('Period')
+        return self.consolidated('Date').resample(frequency)
+
+    def combine_and_average(self, frequency=None):
+        """
+        Combines all DataFrames in collection_df by summing up their Revenue and Expense columns per Period.
+        Returns the combined DataFrame, the average total revenue and average total expense across all periods.
+        Companies missing a period contribute 0 to it.
+        :param frequency: Combine by Date instead, resampled to 'weekly', 'monthly', 'quarterly' or 'yearly'.
+        """
+        consolidated = self._view(frequency)
+        
+        combined_df = pd.DataFrame({
+            consolidated.key: consolidated.periods,
+            'Total Revenue': consolidated.total_revenue,
+            'Total Expense': consolidated.total_expense
+        })
+        
+        # Calculate the average total revenue and total expense across all periods
+        period_count = len(consolidated.periods)
+        avg_total_revenue = consolidated.total_revenue.sum() / period_count
+        avg_total_expense = consolidated.total_expense.sum() / period_count
 
         return combined_df, avg_total_revenue, avg_total_expense
+    
+    def company_contributions(self, frequency=None):
+        """
+        Each company's Revenue and Expense per Period and its share (%) of the combined totals of that Period.
+        Shares are NaN for periods whose combined total is 0.
+        :param frequency: Per Date instead, resampled to 'weekly', 'monthly', 'quarterly' or 'yearly'.
+        """
+        consolidated = self._view(frequency)
+        company_index, period_index = np.nonzero(consolidated.present)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            revenue_share = consolidated.revenue / np.where(consolidated.total_revenue == 0, np.nan, consolidated.total_revenue) * 100
+            expense_share = consolidated.expense / np.where(consolidated.total_expense == 0, np.nan, consolidated.total_expense) * 100
+        
+        return pd.DataFrame({
+            'Company': np.array(consolidated.companies, dtype=object)[company_index],
+            consolidated.key: consolidated.periods[period_index],
+            'Revenue': consolidated.revenue[company_index, period_index],
+            'Expense': consolidated.expense[company_index, period_index],
+            'Revenue Share (%)': revenue_share[company_index, period_index],
+            'Expense Share (%)': expense_share[company_index, period_index]
+        })
         
     def remove_all_companies(self):
         """
         Removes all companies' data from the collection.
         """
         self.collection_df = {}
+        self._consolidated = {}
 
-    def cashflow_plot(self):
+    def _plot_series(self, consolidated, max_companies=None):
+        """
+        (name, Period, Revenue, Expense) arrays of every company to plot, aligned on the consolidated periods.
+        With max_companies, only that many companies with the largest total revenue are plotted and
+        the others are summed into one 'Other' series.
+        """
+        series = [(company_name, consolidated.periods, consolidated.revenue[i], consolidated.expense[i])
+                  for i, company_name in enumerate(consolidated.companies)]
+        
+        if max_companies is None or len(series) <= max_companies:
+            return series
+        
+        # Keep the top companies in their original order, the rest go into 'Other'
+        ranked = np.argsort(-consolidated.revenue.sum(axis=1), kind='stable')
+        top, rest = np.sort(ranked[:max_companies]), ranked[max_companies:]
+        other = (f'Other ({len(rest)} companies)', consolidated.periods,
+                 consolidated.revenue[rest].sum(axis=0), consolidated.expense[rest].sum(axis=0))
+        
+        return [series[i] for i in top] + [other]
+
+    def cashflow_plot(self, max_companies=None, webgl=False, frequency=None):
         """
         Generates an interactive Plotly cashflow plot using Period as the x-axis.
         Combines data from all added companies and displays their cashflow and cumulative cashflow line.
+        :param max_companies: Plot only this many companies with the largest total revenue and sum the
+                              others into an 'Other' series, so the figure stays small with many companies.
+        :param webgl: Draw the line and legend traces with WebGL (Scattergl), for many or long cashflows.
+        :param frequency: Plot by Date instead, resampled to 'weekly', 'monthly', 'quarterly' or 'yearly'.
         """
         # Create a Plotly figure
         fig = go.Figure()
+        scatter = go.Scattergl if webgl else go.Scatter
+        
+        # Consolidated cashflow of all companies, shared by the bars and the cumulative line
+        consolidated = self._view(frequency)
 
-        # Variable to accumulate the total revenue and expense
-        accumulated_revenue = None
-        accumulated_expense = None
-
-        # Loop through each company in the collection and plot the revenue and expense
-        for company_name, df in self.collection_df.items():
+        # Loop through each company (or the 'Other' group) and plot the revenue and expense
+        for company_name, period, revenue, expense in self._plot_series(consolidated, max_companies):
             # Add bars for expenses for each company (same color for all companies' expense)
             fig.add_trace(go.Bar(
-                x=df['Period'], 
-                y=-df['Expense'],  # Expenses are negative
+                x=period, 
+                y=-expense,  # Expenses are negative
                 name='Expense',  # We only show the company name in the legend
                 marker_color='red',
                 legendgroup=company_name,  # Group revenue and expense by company for toggling
                 showlegend=False,  # Don't show separate legend for expenses
-                customdata=np.stack((df['Revenue'], df['Expense']), axis=-1),
+                customdata=expense,
                 hovertemplate=(
                     f'<b>{company_name}</b><br>' +
-                    'Expense: %{customdata[1]:,.0f}<br>'
+                    'Expense: %{customdata:,.0f}<br>'
                 )
             ))
 
             # Add bars for revenue for each company (same color for all companies' revenue)
             fig.add_trace(go.Bar(
-                x=df['Period'], 
-                y=df['Revenue'], 
+                x=period, 
+                y=revenue, 
                 name='Revenue',  # We only show the company name in the legend
                 marker_color='blue',
                 legendgroup=company_name,  # Group revenue and expense by company for toggling
                 showlegend=False,  # Don't show the revenue in the legend again
-                customdata=np.stack((df['Revenue'], df['Expense']), axis=-1),  # Include both revenue and expense for hover
                 hovertemplate=(
                     f'<b>{company_name}</b><br>' +
-                    'Revenue: %{customdata[0]:,.0f}<br>'
+                    'Revenue: %{y:,.0f}<br>'
                 )
             ))
 
             # Add invisible scatter trace for company name in the legend (black or grey)
-            fig.add_trace(go.Scatter(
+            fig.add_trace(scatter(
                 x=[None],  # Empty scatter to only display in legend
                 y=[None],
                 mode='markers',
@@ -122,21 +272,12 @@ class ModelCashflow:
                 showlegend=True
             ))
 
-            # Accumulate the revenue and expense for cumulative calculation
-            if accumulated_revenue is None:
-                accumulated_revenue = df['Revenue'].copy()
-                accumulated_expense = df['Expense'].copy()
-            else:
-                accumulated_revenue += df['Revenue']
-                accumulated_expense += df['Expense']
-
-        # Calculate the net and cumulative cashflow
-        net_cashflow = accumulated_revenue - accumulated_expense
-        cumulative_cashflow = net_cashflow.cumsum()
+        # Calculate the net and cumulative cashflow from the consolidated cashflow of all companies
+        cumulative_cashflow = np.cumsum(consolidated.total_revenue - consolidated.total_expense)
 
         # Add a line for cumulative cashflow
-        fig.add_trace(go.Scatter(
-            x=df['Period'], 
+        fig.add_trace(scatter(
+            x=consolidated.periods, 
             y=cumulative_cashflow, 
             mode='lines+markers', 
             name='Cumulative Cashflow', 
@@ -144,7 +285,7 @@ class ModelCashflow:
             line=dict(dash='solid'),
             hovertemplate=(
                 '<b>Cumulative Cashflow</b><br>' +
-                'Period: %{x}<br>' +
+                f'{consolidated.key}: %{{x}}<br>' +
                 'Cumulative Cashflow: %{y:,.0f}<extra></extra>'
             )
         ))
@@ -153,7 +294,7 @@ class ModelCashflow:
         fig.update_layout(
             title='Consolidated Cashflow',
             yaxis_title='Amount',
-            xaxis_title='Period',  # Change to Period for the x-axis
+            xaxis_title=consolidated.key,  # Period, or Date when resampled
             hovermode='x',  # Ensure hover info displays for all traces on the x-axis
             bargap=0.2,  # Space between bars
             plot_bgcolor='white',
@@ -163,29 +304,34 @@ class ModelCashflow:
         # Show the interactive chart
         return fig
     
-    def create_profit_comparison_matrix(self, scenario_metrics_dict):
+    def create_profit_comparison_matrix(self, scenario_metrics_dict, top_k=None, scenario_keys=None):
+        """
+        Numeric matrix of the percentage difference in average profit between every pair of scenarios:
+        cell (row, column) is (row profit - column profit) / column profit * 100, or NaN where the
+        column's profit is 0. Formatting as percentages is left to the display.
+        :param scenario_metrics_dict: {scenario key: [average revenue, average expense]}.
+        :param top_k: Only compare the top_k scenarios by profit, ordered from the highest profit.
+        :param scenario_keys: Only compare these scenarios.
+        """
+        keys = list(scenario_metrics_dict.keys())
+        if scenario_keys is not None:
+            selected_keys = set(scenario_keys)
+            keys = [key for key in keys if key in selected_keys]
+        
         # Step 1: Calculate the profit for each scenario
-        scenario_profits = {}
-        for key, value in scenario_metrics_dict.items():
-            avg_revenue, avg_expense = value
-            profit = avg_revenue - avg_expense
-            scenario_profits[key] = profit
-        
-        # Step 2: Create the comparison matrix
-        scenario_labels = [f'Scenario {key}' for key in scenario_metrics_dict.keys()]
-        comparison_matrix = pd.DataFrame(index=scenario_labels, columns=scenario_labels)
-        
-        # Step 3: Populate the matrix with the percentage difference in profit
-        for row_key, row_profit in scenario_profits.items():
-            for col_key, col_profit in scenario_profits.items():
-                # Calculate percentage difference: ((row_profit - col_profit) / col_profit) * 100
-                if col_profit != 0:
-                    percentage_diff = ((row_profit - col_profit) / col_profit) * 100
-                    percentage_diff = round(percentage_diff, 0)  # Round to 0 decimal places
-                    percentage_diff = f"{int(percentage_diff)}%"  # Convert to percentage format
-                else:
-                    percentage_diff = "N/A"  # Handle division by zero if col_profit is 0
-                # Set the percentage difference in the matrix
-                comparison_matrix.loc[f'Scenario {row_key}', f'Scenario {col_key}'] = percentage_diff
-        
-        return comparison_matrix
\ No newline at end of file
+        metrics = np.array([scenario_metrics_dict[key] for key in keys], dtype=float).reshape(-1, 2)
+        profits = metrics[:, 0] - metrics[:, 1]
+        
+        if top_k is not None and top_k < len(keys):
+            top = np.argsort(-profits, kind='stable')[:top_k]
+            keys = [keys[i] for i in top]
+            profits = profits[top]
+        
+        # Step 2: Percentage difference of every row profit against every column profit at once
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = (profits[:, None] - profits[None, :]) / profits[None, :] * 100
+        matrix[:, profits == 0] = np.nan
+        
+        # Step 3: Label rows and columns by scenario
+        scenario_labels = [f'Scenario {key}' for key in keys]
+        return pd.DataFrame(matrix, index=scenario_labels, columns=scenario_labels)
@@ -1,12 +1,21 @@
 import streamlit as st
 import pandas as pd
 from cashflow.cashflow_plot import ModelCashflow
-import os
+from data_registry import output_path, result_input_path
+from scenario_store import ScenarioStore
+
+# Companies plotted individually, the others are grouped into 'Other'
+MAX_PLOTTED_COMPANIES = 20
 
 @st.cache_data
 def load_company_data(file_path):
     return pd.read_csv(file_path)
 
+@st.cache_resource
+def load_scenario_store():
+    # Scenarios saved by earlier versions of this page are imported on first use
+    return ScenarioStore(output_path('scenarios.db'), legacy_csv_path=output_path('scenario_metrics.csv'))
+
 def app():
     # Initialize the cashflow model
     cashflow_model = ModelCashflow()
@@ -20,28 +29,42 @@ def app():
     You can select which companies to include in the visualization by using the checkboxes below.
     """)
 
-    # Checkbox for company 1 and company 2
-    company_1_checked = st.checkbox('Corporate Wellness', value=True)
-    company_2_checked = st.checkbox('School Outreach', value=True)
+    # Checkbox and program start month for company 1 and company 2
+    this_month = pd.Timestamp.today().normalize().replace(day=1)
+    col1, col2 = st.columns(2)
+    with col1:
+        company_1_checked = st.checkbox('Corporate Wellness', value=True)
+        company_1_start = st.date_input('Corporate Wellness Start Date', value=this_month)
+    with col2:
+        company_2_checked = st.checkbox('School Outreach', value=True)
+        company_2_start = st.date_input('School Outreach Start Date', value=this_month)
+    
+    # Period view aligns programs on their first month, the other views on their calendar dates
+    frequency_options = {'Period': None, 'Weekly': 'weekly', 'Monthly': 'monthly', 'Quarterly': 'quarterly', 'Yearly': 'yearly'}
+    view = st.selectbox('View', list(frequency_options.keys()))
+    frequency = frequency_options[view]
+    period_unit = {'Weekly': 'Week', 'Quarterly': 'Quarter', 'Yearly': 'Year'}.get(view, 'Month')
 
-    # Load company data using caching
-    df1 = load_company_data('corporate_cashflow.csv')
-    df2 = load_company_data('school_cashflow.csv')
+    # Load company data using caching, as last written by the program pages or else the bundled copies
+    df1 = load_company_data(result_input_path('corporate_cashflow.csv'))
+    df2 = load_company_data(result_input_path('school_cashflow.csv'))
 
     # Function to update the cashflow model
     def update_cashflow_model():
         cashflow_model.remove_all_companies()
         if company_1_checked:
-            cashflow_model.add_company_data('Corporate Wellness', df1)
+            cashflow_model.add_company_data('Corporate Wellness', df1, start_date=company_1_start)
         if company_2_checked:
-            cashflow_model.add_company_data('School Outreach', df2)
+            cashflow_model.add_company_data('School Outreach', df2, start_date=company_2_start)
 
     # Create a placeholder for the plot to be updated later
     cashflow_plot_placeholder = st.empty()
 
     # Initially update the cashflow model and plot
     update_cashflow_model()
-    cashflow_plot_placeholder.plotly_chart(cashflow_model.cashflow_plot())
+    cashflow_plot_placeholder.plotly_chart(cashflow_model.cashflow_plot(max_companies=MAX_PLOTTED_COMPANIES,
+                                                                        webgl=len(cashflow_model.collection_df) > MAX_PLOTTED_COMPANIES,
+                                                                        frequency=frequency))
 
     # # Button to update the cashflow
     # if st.button('Update'):
@@ -50,64 +73,55 @@ def app():
     #     # Update the existing plot in the placeholder
     #     cashflow_plot_placeholder.plotly_chart(cashflow_model.cashflow_plot())
     
-    combined_df, avg_total_revenue, avg_total_expense = cashflow_model.combine_and_average()
+    # Metrics and saved scenarios use the same consolidation as the chart, start dates and view included
+    combined_df, avg_total_revenue, avg_total_expense = cashflow_model.combine_and_average(frequency)
     
     col1, col2 = st.columns(2)
     
     with col1:
-        st.metric("Average Revenue per Month", f"Rp.{avg_total_revenue:,.0f}")
+        st.metric(f"Average Revenue per {period_unit}", f"Rp.{avg_total_revenue:,.0f}")
     with col2:
-        st.metric("Average Expense per Month", f"Rp.{avg_total_expense:,.0f}")
+        st.metric(f"Average Expense per {period_unit}", f"Rp.{avg_total_expense:,.0f}")
+    
+    if frequency is None:
+        st.caption("The Period view aligns the programs on their first month, so the start dates do not change these averages.")
         
+    with st.expander("Contributions per Company"):
+        st.dataframe(cashflow_model.company_contributions(frequency), hide_index=True)
         
-    scenario_metrics = [avg_total_revenue, avg_total_expense]
-    
-    # Filepath for saving scenarios
-    csv_file_path = 'scenario_metrics.csv'
+    # Saved scenarios are shared by all sessions through the scenario store
+    scenario_store = load_scenario_store()
 
-    # Function to save the scenario_metrics_dict to a CSV file
-    def save_scenarios_to_csv(scenario_dict, file_path):
-        df = pd.DataFrame.from_dict(scenario_dict, orient='index', columns=['Avg Total Revenue', 'Avg Total Expense'])
-        df.index.name = 'Scenario'
-        df.to_csv(file_path)
-
-    # Function to load scenarios from a CSV file
-    def load_scenarios_from_csv(file_path):
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path, index_col='Scenario')
-            return df.to_dict(orient='index')
-        return {}
-
-    # Load scenarios from the CSV file into session_state
-    if 'scenario_metrics_dict' not in st.session_state:
-        st.session_state['scenario_metrics_dict'] = load_scenarios_from_csv(csv_file_path)
-    
-
-    # Add a scenario to the dictionary when the button is clicked
+    # Add a scenario to the store when the button is clicked
     if st.button("Save Cashflow Scenario for Comparison"):
-        # Determine the next key to use (incremental based on existing keys)
-        next_key = len(st.session_state['scenario_metrics_dict']) + 1
-        # Add the new scenario to the dictionary
-        st.session_state['scenario_metrics_dict'][next_key] = scenario_metrics
-        # print(st.session_state['scenario_metrics_dict'])
-        # Save the updated dictionary to CSV
-        save_scenarios_to_csv(st.session_state['scenario_metrics_dict'], csv_file_path)
-        st.success(f"Scenario {next_key} saved.")
-
-    # # Display the current saved scenarios
-    # st.write("Current Scenarios:")
-    # st.write(st.session_state['scenario_metrics_dict'])
+        # Record the companies the scenario consolidates, the cashflow files they came from and their start dates
+        company_inputs = {'Corporate Wellness': {'file': 'corporate_cashflow.csv', 'start_date': str(company_1_start)},
+                          'School Outreach': {'file': 'school_cashflow.csv', 'start_date': str(company_2_start)}}
+        scenario_inputs = {'companies': {company: company_inputs[company] for company in cashflow_model.collection_df},
+                           'view': view}
+        
+        # Dated buckets are stored as periods counted from the first one, which the inputs record
+        saved_df = combined_df
+        if 'Date' in combined_df.columns:
+            scenario_inputs['first_date'] = str(combined_df['Date'].iloc[0].date())
+            saved_df = combined_df.assign(Period=range(1, len(combined_df) + 1))
+        scenario_id = scenario_store.save(avg_total_revenue, avg_total_expense, cashflow_df=saved_df, inputs=scenario_inputs)
+        st.success(f"Scenario {scenario_id} saved.")
 
     st.divider()
 
     # Reset all scenarios
     if st.button("Reset All Scenario"):
-        # Clear session state and remove CSV file
-        st.session_state['scenario_metrics_dict'] = {}
-        if os.path.exists(csv_file_path):
-            os.remove(csv_file_path)
+        scenario_store.clear()
         st.success("All scenarios have been erased.")
         
-    comparison_matrix = cashflow_model.create_profit_comparison_matrix(st.session_state['scenario_metrics_dict'])
+    # Only the most profitable scenarios are compared, picked by the store's profit index
+    top_k = st.number_input("Number of Scenarios to Compare (highest profit first)", min_value=1, value=20, step=1)
+    top_scenarios = scenario_store.metrics(order_by_profit=True, limit=top_k).index
+    
+    comparison_matrix = cashflow_model.create_profit_comparison_matrix(scenario_store.metrics_dict(top_scenarios), top_k=top_k)
     
-    st.dataframe(comparison_matrix)
\ No newline at end of file
+    # The matrix stays numeric, percentages are only formatted for display
+    st.dataframe(comparison_matrix, column_config={
+        column: st.column_config.NumberColumn(column, format="%.0f%%") for column in comparison_matrix.columns
+    })
@@ -0,0 +1,94 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+def _update_hash(digest, value):
+    # Type names are included so e.g. 1, 1.0 and '1' hash differently
+    digest.update(type(value).__name__.encode())
+
+    if isinstance(value, pd.DataFrame):
+        digest.update(repr((list(value.columns), [str(dtype) for dtype in value.dtypes])).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(repr((value.name, str(value.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(repr((value.dtype.str, value.shape)).encode())
+        digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object else repr(value.tolist()).encode())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            _update_hash(digest, key)
+            _update_hash(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(str(len(value)).encode())
+        for item in value:
+            _update_hash(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+
+def stable_hash(*values):
+    """
+    Content hash of scalars, strings, lists, tuples, dicts, NumPy arrays and pandas objects.
+    Equal content gives the same hash across calls and processes.
+    """
+    digest = hashlib.sha1()
+    for value in values:
+        _update_hash(digest, value)
+    return digest.hexdigest()
+
+
+class ComputeGraph:
+    """
+    Dependency graph of memoized computations. Inputs are set on every run; a node is only
+    recomputed when the fingerprint of one of its (transitive) inputs changed since it was
+    last computed, otherwise its previous value is returned. Node values are shared between
+    runs, so callers must not modify them in place.
+    """
+    def __init__(self):
+        self._inputs = {}
+        self._nodes = {}
+        self._values = {}
+        # Number of times each node has been computed
+        self.compute_counts = {}
+
+    def add_node(self, name, func, dependencies):
+        """
+        Register a node computed as func(*values of dependencies), where dependencies are
+        the names of inputs or other nodes.
+        """
+        self._nodes[name] = (func, list(dependencies))
+        self.compute_counts[name] = 0
+
+    def set_input(self, name, value):
+        self._inputs[name] = (stable_hash(value), value)
+
+    def fingerprint(self, name):
+        if name in self._inputs:
+            return self._inputs[name][0]
+        if name not in self._nodes:
+            raise KeyError(f"Unknown input or node '{name}'")
+
+        _, dependencies = self._nodes[name]
+        return stable_hash(name, [self.fingerprint(dependency) for dependency in dependencies])
+
+    def get(self, name):
+        """
+        Value of an input or node, computing the node and its dependencies only if needed.
+        """
+        if name in self._inputs:
+            return self._inputs[name][1]
+
+        fingerprint = self.fingerprint(name)
+        cached = self._values.get(name)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        func, dependencies = self._nodes[name]
+        value = func(*[self.get(dependency) for dependency in dependencies])
+
+        self._values[name] = (fingerprint, value)
+        self.compute_counts[name] += 1
+        return value
@@ -3,8 +3,58 @@ import pandas as pd
 from model import ModelCorporateWellness, GeneralModel  # Importing the Model class from model.py
 import numpy as np
 import plotly.graph_objs as go
+from compute_graph import ComputeGraph
+from data_registry import output_path
+from unit_economics import selection_vector, unit_economics_table
+
+
+def _configure_model(pricing_basis, parameters, treatment_prices_df, treatment_costs_df, dsp_editor_df):
+    # Model with the page's parameters and edited tables, owning copies of the tables
+    model = ModelCorporateWellness()
+    model.set_pricing_basis(pricing_basis)
+    model.set_parameters(**parameters)
+    model.prices_df = treatment_prices_df.copy()
+    model.costs_df = treatment_costs_df.copy()
+    model.dsp_df = dsp_editor_df.copy()
+    return model
+
+
+def _wellness_results(model):
+    aro = model.calculate_ARO()
+    total_cost = model.calculate_total_cost()
+    dsp_aro, dsp_cost, dsp_df_output = model.calculate_DSP(model.dsp_df, model.total_joining_employee)
+    return aro, total_cost, dsp_aro, dsp_cost, dsp_df_output
+
+
+def _treatment_bundles(model, bundle_settings):
+    return model.rank_bundles(bundle_settings['candidates'], top_k=bundle_settings['top_k'],
+                              min_price=bundle_settings['min_price'], max_price=bundle_settings['max_price'])
+
+
+def _sensitivity_analysis(model, sweep_settings):
+    return model.run_sensitivity_analysis(sweep_settings['variables'], sweep_settings['increments'])
+
+
+def _build_graph():
+    """
+    Dependency graph of the page's computations, so a rerun only recomputes the stages
+    whose inputs changed (e.g. the sensitivity grid is not re-evaluated when an unrelated widget changes).
+    """
+    graph = ComputeGraph()
+    graph.add_node('model', _configure_model,
+                   ['pricing_basis', 'parameters', 'treatment_prices', 'treatment_costs', 'dsp_editor'])
+    graph.add_node('wellness_results', _wellness_results, ['model'])
+    graph.add_node('bundles', _treatment_bundles, ['model', 'bundle_settings'])
+    graph.add_node('sensitivity', _sensitivity_analysis, ['model', 'sweep_settings'])
+    return graph
+
 
 def app():
+    
+    # Memoized computations, kept across reruns of this session
+    if 'corporate_wellness_graph' not in st.session_state:
+        st.session_state['corporate_wellness_graph'] = _build_graph()
+    graph = st.session_state['corporate_wellness_graph']
 
     # Load treatment prices CSV to get the list of treatments
 
@@ -81,12 +131,10 @@ def app():
         
 
         # sum_treatment_prices = st.session_state.treatment_prices_df['Price (Rp.)'].sum()
-        sum_treatment_costs = st.session_state.treatment_costs_df[st.session_state.treatment_costs_df['Component'].isin(selected_treatments)]['Material Cost (Rp.)'].sum()
-        
-        st.session_state.treatment_costs_df['Dentist Fee Total (Rp.)'] = (st.session_state.treatment_costs_df['Dentist Fee per Hour (Rp.)'] * 
-                                                    (st.session_state.treatment_costs_df['Duration (Min)'] / 60))
-        
-        sum_treatment_costs +=  st.session_state.treatment_costs_df[st.session_state.treatment_costs_df['Component'].isin(selected_treatments)]['Dentist Fee Total (Rp.)'].sum()
+        # Material cost and dentist fee of the selected treatments, from the unit economics of the edited tables
+        treatment_unit_economics = unit_economics_table('corporate', st.session_state.treatment_prices_df, st.session_state.treatment_costs_df)
+        selection = selection_vector(treatment_unit_economics, selected_treatments)
+        sum_treatment_costs = selection @ (treatment_unit_economics['Material Cost (Rp.)'] + treatment_unit_economics['Dentist Fee (Rp.)']).to_numpy()
 
         # st.write(f"Total Treatment Prices: {sum_treatment_prices}")
         st.write(f"Total Treatment Costs: Rp.{sum_treatment_costs:,.0f}")
@@ -107,9 +155,8 @@ def app():
     st.markdown('#### Dental Saving Plan Parameters')
 
     # DSP Editor for checkboxes, discount rate adjustments, and conversion rate adjustments
+    # (the '%' strings of the rate columns are already converted to numbers when the data is loaded)
     dsp_df['Selected'] = dsp_df['Treatment'].apply(lambda x: True)  # default all selected
-    dsp_df['Conversion Rate (%)'] = dsp_df['Conversion Rate (%)'].apply(lambda x: float(x.replace('%', '')))
-    dsp_df['Discount Price (%)'] = dsp_df['Discount Price (%)'].apply(lambda x: float(x.replace('%', '')))
 
     # Filtered DSP dataframe to show only Selected, Conversion Rate, and Discount Rate in the editor
     # dsp_editable_df = dsp_df[['Treatment', 'Selected', 'Conversion Rate', 'Discount Rate']]
@@ -119,9 +166,33 @@ def app():
     dsp_editor = st.data_editor(dsp_df, use_container_width=True, num_rows="dynamic", column_order=
                                 ['Treatment', 'Selected', 'Conversion Rate (%)', 'Original Price (Rp.)', 'Discount Price (%)', 'Cost Material (Rp.)', 'Dentist Fee Per Hour (Rp.)', 'Duration (Min)'], hide_index=True)
 
+    # Model inputs of the computation graph
+    graph.set_input('pricing_basis', pricing_basis)
+    graph.set_input('parameters', dict(total_potential_employee=total_potential_employee,
+                                       conversion_rate=conversion_rate,
+                                       treatments=selected_treatments,
+                                       discount_package=discount_package,
+                                       subscription_length=subscription_length))
+    graph.set_input('treatment_prices', st.session_state.treatment_prices_df)
+    graph.set_input('treatment_costs', st.session_state.treatment_costs_df)
+    graph.set_input('dsp_editor', dsp_editor)
+
     # Submit button
     # submit_button = st.form_submit_button(label="Submit")
     
+    with st.expander("Optimizer Settings", expanded=False):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            conversion_elasticity = st.number_input("Conversion Elasticity (%)", value=2.0, step=0.5, min_value=0.0,
+                                                    help="Relative change of the conversion rates per discount point, e.g. 2 means each extra discount point converts 2% more customers")
+            fixed_cost = st.number_input("Fixed Program Cost (Rp.)", value=0, step=1000000, min_value=0,
+                                         help="Cost the program profit must cover to break even")
+        with col2:
+            use_target_margin = st.checkbox("Target Profit Margin", value=False,
+                                            help="Maximise revenue at the target margin instead of maximising profit")
+            target_margin = st.number_input("Profit Margin (%)", value=40, step=5, disabled=not use_target_margin)
+    
     basic_run, optimized_run = st.columns(2)
 
     basic_run_button = basic_run.button(label="Run Calculation", use_container_width=True)
@@ -130,21 +201,9 @@ def app():
 
     # If the form is submitted, create a Model instance and display the ARO calculation
     if basic_run_button:
-        # Create an instance of the Model class from model.py
-        
-        
-        model.set_parameters(total_potential_employee=total_potential_employee,
-            conversion_rate=conversion_rate,
-            treatments=selected_treatments,
-            discount_package=discount_package,
-            subscription_length=subscription_length,
-        )
-        
-        
-        
-        # Calculate ARO and total cost for Employee Wellness Program
-        aro = model.calculate_ARO(st.session_state.treatment_prices_df)
-        total_cost = model.calculate_total_cost(st.session_state.treatment_costs_df)
+        # Calculate ARO and total cost for Employee Wellness Program, and ARO and cost for DSP
+        # (reused from the previous run if none of the inputs changed)
+        aro, total_cost, dsp_aro, dsp_cost, dsp_df_output = graph.get('wellness_results')
         
         # Calculate Total Joining Employee
         total_joining_employee = np.ceil(total_potential_employee * (conversion_rate / 100))
@@ -152,8 +211,6 @@ def app():
         # Calculate total profit generated
         total_profit = aro - total_cost
         
-        # Calculate ARO and cost for DSP
-        dsp_aro, dsp_cost, dsp_df_output = model.calculate_DSP(dsp_editor, total_joining_employee)
         total_dsp_profit = dsp_aro - dsp_cost
         
         # Display results using st.metric
@@ -209,13 +266,14 @@ def app():
         with col2:
             st.metric(label="Total Profit", value="Rp{:,.0f}".format(total_profit_overall))
             
-        cashflow_df = GeneralModel().create_cashflow_df(total_revenue_overall, total_cost_overall, subscription_length, 1, period_type='yearly')
+        cashflow_df = GeneralModel().program_cashflow_df('corporate_wellness', total_revenue_overall, total_cost_overall, subscription_length, 1,
+                                                         period_type='yearly', seed_inputs=(subscription_length,))
         
         # st.dataframe(cashflow_df, hide_index=True)
         # st.write(f'Average Revenue: Rp.{cashflow_df["Revenue"].mean():,.0f}')
         # st.write(f'Total Revenue: Rp.{cashflow_df["Revenue"].sum():,.0f}')
         
-        cashflow_df.to_csv('corporate_cashflow.csv', index=False)
+        cashflow_df.to_csv(output_path('corporate_cashflow.csv'), index=False)
         
         
         
@@ -230,24 +288,67 @@ def app():
             discount_package=discount_package,
             subscription_length=subscription_length,
         )
+        model.prices_df = st.session_state.treatment_prices_df.copy()
+        model.costs_df = st.session_state.treatment_costs_df.copy()
+        model.dsp_df = dsp_editor.copy()
+        
+        # Search the discounts and the treatments (among all priced treatments) on the vectorized model
+        optimized = model.optimize(treatment_list, conversion_elasticity=conversion_elasticity,
+                                   target_margin=target_margin if use_target_margin else None)
+        
+        if not optimized['target_met']:
+            st.warning(f"A {target_margin:.0f}% profit margin cannot be reached, showing the highest margin ({optimized['profit_margin']:.1f}%) instead.")
+        
+        st.markdown('#### Optimized Parameters')
         
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric(label="Discount Package (%)", value="{:.0f}".format(optimized['discount_package']))
+            st.metric(label="Conversion Rate (%)", value="{:.1f}".format(optimized['conversion_rate']))
+        with col2:
+            st.metric(label="DSP Discount Price (%)", value="{:.0f}".format(optimized['dsp_discount_price']))
+            st.metric(label="Profit Margin (%)", value="{:.1f}".format(optimized['profit_margin']))
         
+        st.write("Treatment Package: " + ", ".join(optimized['treatments']))
+        
+        model.set_parameters(total_potential_employee=total_potential_employee,
+            conversion_rate=optimized['conversion_rate'],
+            treatments=optimized['treatments'],
+            discount_package=optimized['discount_package'],
+            subscription_length=subscription_length,
+        )
+        
+        # DSP treatments at the optimized discount, with their conversion rates following it
+        optimized_dsp = dsp_editor.copy()
+        optimized_selected = optimized_dsp['Selected'] == True
+        optimized_dsp.loc[optimized_selected, 'Discount Price (%)'] = optimized['dsp_discount_price']
+        optimized_dsp.loc[optimized_selected, 'Conversion Rate (%)'] = optimized['dsp_conversion_rates']
         
         # Calculate ARO and total cost for Employee Wellness Program
-        aro = model.calculate_ARO(st.session_state.treatment_prices_df)
-        total_cost = model.calculate_total_cost(st.session_state.treatment_costs_df)
+        aro = model.calculate_ARO()
+        total_cost = model.calculate_total_cost()
         
         # Calculate Total Joining Employee
-        total_joining_employee = np.ceil(total_potential_employee * (conversion_rate / 100))
+        total_joining_employee = model.total_joining_employee
         
         # Calculate total profit generated
         total_profit = aro - total_cost
         
-        dsp_editor['Dentist Fee Per Hour (Rp.)'] = 140000
-        dsp_editor['Original Price (Rp.)'] = dsp_editor['Original Price (Rp.)'] * 1.2
-        
         # Calculate ARO and cost for DSP
-        dsp_aro, dsp_cost, dsp_df_output = model.calculate_DSP(dsp_editor, total_joining_employee)
+        dsp_aro, dsp_cost, dsp_df_output = model.calculate_DSP(optimized_dsp, total_joining_employee)
+        model.dsp_df = optimized_dsp
+        
+        # Smallest program covering the fixed cost with the optimized parameters
+        min_joining_employee, min_potential_employee = model.break_even(fixed_cost)
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.metric(label="Break-even Joining Employee", value="-" if min_joining_employee is None else min_joining_employee)
+        with col2:
+            st.metric(label="Break-even Potential Employee", value="-" if min_potential_employee is None else min_potential_employee)
+        
         total_dsp_profit = dsp_aro - dsp_cost
         
         
@@ -304,16 +405,38 @@ def app():
         with col2:
             st.metric(label="Total Profit", value="Rp{:,.0f}".format(total_profit_overall))
             
-        cashflow_df = GeneralModel().create_cashflow_df(total_revenue_overall, total_cost_overall, subscription_length, 1, period_type='yearly')
+        cashflow_df = GeneralModel().program_cashflow_df('corporate_wellness', total_revenue_overall, total_cost_overall, subscription_length, 1,
+                                                         period_type='yearly', seed_inputs=(subscription_length,))
         
         # st.dataframe(cashflow_df, hide_index=True)
         # st.write(f'Average Revenue: Rp.{cashflow_df["Revenue"].mean():,.0f}')
         # st.write(f'Total Revenue: Rp.{cashflow_df["Revenue"].sum():,.0f}')
         
-        cashflow_df.to_csv('corporate_cashflow.csv', index=False)
+        cashflow_df.to_csv(output_path('corporate_cashflow.csv'), index=False)
         
     st.divider()
     
+    st.markdown('#### Treatment Bundles')
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        bundle_top_k = st.number_input("Number of Bundles", min_value=1, value=10, step=1)
+    with col2:
+        bundle_min_price = st.number_input("Minimum Monthly Price (Rp.)", min_value=0, value=0, step=50000)
+    with col3:
+        bundle_max_price = st.number_input("Maximum Monthly Price (Rp.)", min_value=0, value=0, step=50000, help="0 for no maximum")
+    
+    st.caption('Every combination of the priced treatments at the package discount above, ranked by monthly profit per joining employee')
+    
+    graph.set_input('bundle_settings', {'candidates': treatment_list, 'top_k': bundle_top_k,
+                                        'min_price': bundle_min_price, 'max_price': bundle_max_price or None})
+    bundles_df = graph.get('bundles')
+    
+    st.dataframe(bundles_df, hide_index=True, use_container_width=True)
+    
+    st.divider()
+    
     st.markdown('#### Sensitivity Analysis')
     
     col1, col2 = st.columns(2)
@@ -329,13 +452,14 @@ def app():
         
         var_two_increment = st.number_input("Set Increment for Var 2", value=10, step=1)
         
-    st.caption('Please Re-Run the model if you change the sensitivity analysis parameters')
+    st.caption('The sensitivity analysis follows the parameters above and is only recomputed when they change')
         
     # create a variable called var_list that will list var_one and var_two in a list
     var_list = [var_one, var_two]
     increment_list = [var_one_increment, var_two_increment]
     
-    fig_sensitivity_analysis, sensitivity_analysis_df = model.run_sensitivity_analysis(var_list, increment_list)
+    graph.set_input('sweep_settings', {'variables': var_list, 'increments': increment_list})
+    fig_sensitivity_analysis, sensitivity_analysis_df = graph.get('sensitivity')
     
     st.dataframe(sensitivity_analysis_df, hide_index=True, use_container_width=True)
     
@@ -0,0 +1,325 @@
+import argparse
+import hashlib
+import io
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Values such as '20%' or '29.82%' in the DSP files
+PERCENT_PATTERN = re.compile(r'^\s*-?\d+(\.\d+)?\s*%\s*$')
+
+# Environment variable pointing at an alternative data root, e.g. a shared volume or RAM-disk copy
+DATA_ROOT_ENV = 'AVC_DATA_ROOT'
+
+# Directory of this package, holding the bundled *_data directories
+PACKAGE_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Environment variable pointing at the directory the pages write their results to, e.g. a writable volume
+OUTPUT_ROOT_ENV = 'AVC_OUTPUT_ROOT'
+
+# Bumped whenever the schemas or the cache layout change, which invalidates existing caches
+CACHE_VERSION = 1
+
+# Column types: 'str' (whitespace stripped), 'float', or 'number' (int64 when all values are whole, else float64)
+TREATMENT_PRICE_COLUMNS = {'Treatment': 'str', 'Price (Rp.)': 'number'}
+TREATMENT_COST_COLUMNS = {'Component': 'str', 'Material Cost (Rp.)': 'number',
+                          'Dentist Fee per Hour (Rp.)': 'number', 'Duration (Min)': 'number'}
+DSP_COLUMNS = {'Treatment': 'str', 'Conversion Rate (%)': 'float', 'Original Price (Rp.)': 'number',
+               'Discount Price (%)': 'float', 'Price (Rp.)': 'number', 'Cost Material (Rp.)': 'number',
+               'Duration (Min)': 'number', 'Dentist Fee Per Hour (Rp.)': 'number'}
+EVENT_COST_COLUMNS = {'Component': 'str', 'Unit': 'number', 'Cost per Unit (Rp.)': 'number'}
+OUTREACH_PRICE_COLUMNS = {'Treatment': 'str', 'Original Price (Rp.)': 'number', 'Unit of Measure': 'str',
+                          'Dentist Fee (Rp.)': 'number', 'Cost Material (Rp.)': 'number', 'Conversion Rate (%)': 'number'}
+SCHOOL_PRICE_COLUMNS = {'Treatment': 'str', 'Category': 'str', 'Original Price (Rp.)': 'number', 'Unit of Measure': 'str',
+                        'Dentist Fee (Rp.)': 'number', 'Cost Material (Rp.)': 'number', 'total_duration': 'float',
+                        'Dentist Fee per Hour': 'number'}
+PACKAGE_LIST_COLUMNS = {'Treatment Package': 'str', 'Category': 'str', 'Description': 'str',
+                        'Conversion Rate Single (%)': 'number', 'Conversion Rate Family (%)': 'number'}
+
+# Schema of every program data file, keyed by (directory, file name)
+SCHEMAS = {
+    ('corporate_wellness_data', 'treatment_prices.csv'): TREATMENT_PRICE_COLUMNS,
+    ('corporate_wellness_data', 'treatment_prices_GAIA_IDR.csv'): TREATMENT_PRICE_COLUMNS,
+    ('corporate_wellness_data', 'treatment_costs.csv'): TREATMENT_COST_COLUMNS,
+    ('corporate_wellness_data', 'treatment_costs_GAIA_IDR.csv'): TREATMENT_COST_COLUMNS,
+    ('corporate_wellness_data', 'dsp.csv'): DSP_COLUMNS,
+    ('corporate_wellness_data', 'dsp_GAIA_IDR.csv'): DSP_COLUMNS,
+    ('school_outreach_data', 'treatment_prices_new.csv'): SCHOOL_PRICE_COLUMNS,
+    ('school_outreach_data', 'treatment_prices_GAIA_IDR.csv'): SCHOOL_PRICE_COLUMNS,
+    ('school_outreach_data', 'treatment_prices.csv'): OUTREACH_PRICE_COLUMNS,
+    ('school_outreach_data', 'package_list.csv'): PACKAGE_LIST_COLUMNS,
+    ('school_outreach_data', 'event_cost.csv'): EVENT_COST_COLUMNS,
+    ('agecare_outreach_data', 'treatment_prices.csv'): OUTREACH_PRICE_COLUMNS,
+    ('agecare_outreach_data', 'event_cost.csv'): EVENT_COST_COLUMNS,
+    ('special_needs_outreach_data', 'treatment_prices.csv'): dict(OUTREACH_PRICE_COLUMNS, **{'Sedation Cost (Rp.)': 'number'}),
+    ('special_needs_outreach_data', 'event_cost.csv'): EVENT_COST_COLUMNS,
+}
+
+
+def data_root(root=None):
+    """
+    Root directory of the program data: the given root, else $AVC_DATA_ROOT, else the package directory.
+    """
+    if root is None:
+        root = os.environ.get(DATA_ROOT_ENV) or PACKAGE_ROOT
+    return os.path.abspath(root)
+
+
+def data_path(*path_parts, root=None):
+    """
+    Absolute path of a data file given as path parts relative to the data root,
+    e.g. data_path('corporate_wellness_data', 'dsp.csv').
+    """
+    return os.path.join(data_root(root), *path_parts)
+
+
+def output_root(root=None):
+    """
+    Directory the pages write their results (cashflows, price tables, saved scenarios) to: the given root,
+    else $AVC_OUTPUT_ROOT, else the package directory. Created when missing.
+    """
+    if root is None:
+        root = os.environ.get(OUTPUT_ROOT_ENV) or PACKAGE_ROOT
+    root = os.path.abspath(root)
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def output_path(*path_parts, root=None):
+    """
+    Absolute path of a result file given as path parts relative to the output root,
+    e.g. output_path('corporate_cashflow.csv').
+    """
+    return os.path.join(output_root(root), *path_parts)
+
+
+def result_input_path(*path_parts, root=None):
+    """
+    Path of a result file read back as input: the one in the output root when a page has written it,
+    else the copy bundled with the package.
+    """
+    path = output_path(*path_parts, root=root)
+    if os.path.exists(path):
+        return path
+    return os.path.join(PACKAGE_ROOT, *path_parts)
+
+
+def cache_path(path):
+    """
+    Path of the binary cache of a data file, next to it.
+    """
+    return os.path.splitext(path)[0] + '.npz'
+
+
+def _copy_on_write_enabled():
+    # Copy-on-Write is always on from pandas 3.0, and opt-in before that
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.options.mode.copy_on_write is True
+
+
+def _schema_for(path):
+    return SCHEMAS.get((os.path.basename(os.path.dirname(path)), os.path.basename(path)))
+
+
+def apply_schema(df, schema, path):
+    """
+    Validate that df has the schema's columns and coerce them to the schema's types.
+    Raises ValueError naming the file and column on the first violation.
+    """
+    missing = [column for column in schema if column not in df.columns]
+    if missing:
+        raise ValueError(f"{path}: missing columns {missing}")
+
+    for column, column_type in schema.items():
+        if column_type == 'str':
+            if df[column].isna().all():
+                df[column] = df[column].astype(object)
+            elif pd.api.types.is_numeric_dtype(df[column]):
+                raise ValueError(f"{path}: column '{column}' must be text")
+            else:
+                df[column] = df[column].str.strip()
+            continue
+
+        try:
+            values = pd.to_numeric(df[column]).astype(float)
+        except (TypeError, ValueError) as error:
+            raise ValueError(f"{path}: column '{column}' must be numeric ({error})") from None
+
+        if column_type == 'number' and values.notna().all() and (values % 1 == 0).all():
+            values = values.astype('int64')
+        df[column] = values
+
+    return df
+
+
+def normalise_dataframe(df, schema=None, path=None):
+    """
+    Normalise a freshly parsed data file: drop the unnamed index column left by DataFrame.to_csv,
+    strip whitespace around column names, convert percent strings to floats and, when a schema
+    is given, validate and coerce the column types.
+    """
+    df = df.drop(columns=[column for column in df.columns if str(column).startswith('Unnamed: ')])
+    df.columns = [str(column).strip() for column in df.columns]
+
+    for column in df.columns:
+        values = df[column].dropna()
+        if (not pd.api.types.is_numeric_dtype(df[column]) and len(values) > 0
+                and values.map(lambda x: isinstance(x, str) and bool(PERCENT_PATTERN.match(x))).all()):
+            df[column] = df[column].str.replace('%', '', regex=False).astype(float)
+
+    if schema is not None:
+        df = apply_schema(df, schema, path)
+
+    return df
+
+
+def write_cache(df, path, source_hash):
+    """
+    Write a normalised frame as a NumPy .npz archive: one array per column, with text columns
+    stored as fixed-width unicode plus a missing-value mask so no pickling is needed.
+    """
+    arrays = {'__columns__': np.array(df.columns, dtype=str),
+              '__source_hash__': np.array(source_hash),
+              '__version__': np.array(CACHE_VERSION)}
+
+    for i, column in enumerate(df.columns):
+        if pd.api.types.is_numeric_dtype(df[column]):
+            arrays[f'column_{i}'] = df[column].to_numpy()
+        else:
+            arrays[f'column_{i}'] = df[column].fillna('').astype(str).to_numpy(dtype=str)
+            arrays[f'missing_{i}'] = df[column].isna().to_numpy()
+
+    np.savez(path, **arrays)
+
+
+def read_cache(path, source_hash=None):
+    """
+    Read a frame written by write_cache. Returns None when the cache is from another cache version
+    or, if source_hash is given, was built from different source content.
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        if int(archive['__version__']) != CACHE_VERSION:
+            return None
+        if source_hash is not None and str(archive['__source_hash__']) != source_hash:
+            return None
+
+        columns = {}
+        for i, column in enumerate(archive['__columns__']):
+            values = archive[f'column_{i}']
+            if f'missing_{i}' in archive:
+                values = pd.Series(values.astype(object)).mask(archive[f'missing_{i}'])
+            columns[str(column)] = values
+
+    return pd.DataFrame(columns)
+
+
+def ingest(root=None):
+    """
+    Validate every data file with a schema under the data root and write its binary cache.
+    Returns the paths of the written caches; raises ValueError on the first schema violation.
+    """
+    written = []
+
+    for path_parts, schema in SCHEMAS.items():
+        path = data_path(*path_parts, root=root)
+        if not os.path.exists(path):
+            continue
+
+        with open(path, 'rb') as file:
+            content = file.read()
+
+        df = normalise_dataframe(pd.read_csv(io.BytesIO(content)), schema, path)
+        write_cache(df, cache_path(path), hashlib.sha1(content).hexdigest())
+        written.append(cache_path(path))
+
+    return written
+
+
+class DataRegistry:
+    """
+    Process-wide cache of the program data files. Each file is parsed and normalised once and
+    handed out as a copy-on-write view; it is only re-read when its modification time or size
+    changes, and only re-parsed when its content hash changes too. Files with an up-to-date
+    binary cache (see ingest) are loaded from it instead of being parsed.
+    """
+    def __init__(self):
+        # Path to (stat signature, content hash, DataFrame)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def load(self, *path_parts, root=None):
+        """
+        Return the normalised DataFrame of the data file at path_parts relative to the data root.
+        Callers may modify the returned frame without affecting the cached one.
+        """
+        path = data_path(*path_parts, root=root)
+
+        with self._lock:
+            df = self._load_entry(path)
+
+        # With Copy-on-Write a shallow copy is a lazy view, otherwise take a real copy
+        return df.copy(deep=not _copy_on_write_enabled())
+
+    def _load_entry(self, path):
+        # A data volume may ship only the binary caches
+        if not os.path.exists(path) and os.path.exists(cache_path(path)):
+            return self._load_cache_only(path)
+
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[2]
+
+        with open(path, 'rb') as file:
+            content = file.read()
+        content_hash = hashlib.sha1(content).hexdigest()
+
+        # Touched but unchanged files keep their parsed frame
+        if entry is not None and entry[1] == content_hash:
+            df = entry[2]
+        else:
+            df = None
+            if os.path.exists(cache_path(path)):
+                df = read_cache(cache_path(path), content_hash)
+            if df is None:
+                df = normalise_dataframe(pd.read_csv(io.BytesIO(content)), _schema_for(path), path)
+
+        self._entries[path] = (signature, content_hash, df)
+        return df
+
+    def _load_cache_only(self, path):
+        stat = os.stat(cache_path(path))
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != signature:
+            df = read_cache(cache_path(path))
+            if df is None:
+                raise ValueError(f"{cache_path(path)}: cache was written by another version, re-run the ingest")
+            entry = (signature, None, df)
+            self._entries[path] = entry
+
+        return entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+# Shared by all models and Streamlit sessions in the process
+registry = DataRegistry()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Validate the program data files and write their binary caches.")
+    parser.add_argument('--root', default=None, help=f"Data root (default: ${DATA_ROOT_ENV} or the package directory)")
+    args = parser.parse_args()
+
+    for written_path in ingest(args.root):
+        print(written_path)
@@ -1,16 +1,155 @@
 import pandas as pd
 import numpy as np
 import random
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
 import plotly.graph_objs as go
+from compute_graph import stable_hash
+from data_registry import registry
+from result_cache import result_cache
+from unit_economics import OUTREACH_COST_COLUMNS, dentist_fee, selection_vector, unit_economics_table
+
+def cashflow_seed(*inputs):
+    """
+    Seed derived from the content of the given inputs, so identical inputs give identical cashflows.
+    """
+    return int(stable_hash(*inputs)[:16], 16)
+
+
+def spawn_rngs(seed, n_streams):
+    """
+    n_streams independent numpy Generators spawned from one seed, e.g. one per scenario, so scenarios
+    can be generated in any order or in parallel and still give the same cashflows.
+    """
+    return [np.random.default_rng(seed_sequence) for seed_sequence in np.random.SeedSequence(seed).spawn(n_streams)]
+
+
+def _draw_volume_batch(seed_sequence, n_paths, forecast_periods, denominator):
+    """
+    Draw a (n_paths, forecast_periods) matrix of period volumes with the same scheme as
+    GeneralModel.create_cashflow_df, each row scaled to sum up to denominator.
+    seed_sequence may be a SeedSequence, a seed or a Generator, which is then drawn from.
+    Module-level so it can be sent to a process pool.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    
+    # Random volumes for all but the last period, the last one making up the remainder
+    random_volumes = rng.integers(1, denominator, size=(n_paths, forecast_periods - 1))
+    final_volume = np.maximum(denominator - random_volumes.sum(axis=1, keepdims=True), 1)
+    
+    volumes = np.hstack([random_volumes, final_volume]).astype(float)
+    return volumes / volumes.sum(axis=1, keepdims=True) * denominator
+
+
+def _dirichlet_around(rng, base, n_scenarios, concentration):
+    """
+    (n_scenarios, len(base)) Dirichlet weights whose expected shape is base. concentration is the
+    Dirichlet parameter of an average period: the higher, the closer the rows stay to base.
+    With concentration=None, every row is base itself.
+    """
+    base = np.asarray(base, dtype=float)
+    base = base / base.mean()
+    
+    if concentration is None:
+        weights = np.tile(base, (n_scenarios, 1))
+    else:
+        # Normalised independent gamma draws are Dirichlet distributed, for all scenarios at once
+        weights = rng.gamma(concentration * base, size=(n_scenarios, len(base)))
+    
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def uniform_weights(rng, n_scenarios, n_periods, denominator=100):
+    """
+    The original fluctuation scheme: uniform random volumes in [1, denominator) for all but the last
+    period, which makes up the remainder (at least 1).
+    """
+    return _draw_volume_batch(rng, n_scenarios, n_periods, denominator) / denominator
+
+
+def dirichlet_weights(rng, n_scenarios, n_periods, concentration=20.0):
+    """
+    Weights fluctuating around an even split, with no period treated differently.
+    """
+    return _dirichlet_around(rng, np.ones(n_periods), n_scenarios, concentration)
+
+
+def seasonal_profile(cashflow_df, column='Revenue'):
+    """
+    Relative level of each calendar month (January first, mean 1) in a cashflow with a Date column.
+    Months missing from the data get the average level.
+    """
+    months = pd.to_datetime(cashflow_df['Date']).dt.month
+    monthly_means = cashflow_df.groupby(months)[column].mean().reindex(range(1, 13))
+    monthly_means = monthly_means.fillna(monthly_means.mean())
+    return (monthly_means / monthly_means.mean()).to_numpy()
+
+
+def seasonal_weights(rng, n_scenarios, n_periods, profile=None, start_month=1, concentration=20.0):
+    """
+    Weights fluctuating around a seasonal profile of 12 monthly levels, period 1 being start_month.
+    The default profile is the one of the historical cashflow in cashflow/dummy_cashflow_data.csv.
+    """
+    if profile is None:
+        profile = seasonal_profile(registry.load('cashflow', 'dummy_cashflow_data.csv'))
+    
+    base = np.asarray(profile, dtype=float)[(start_month - 1 + np.arange(n_periods)) % 12]
+    return _dirichlet_around(rng, base, n_scenarios, concentration)
+
+
+def ramp_weights(rng, n_scenarios, n_periods, ramp_periods=6, initial_level=0.2, concentration=20.0):
+    """
+    Weights fluctuating around a ramp-up curve for new partners: the level grows linearly from
+    initial_level (relative to the full level) to the full level over the first ramp_periods periods.
+    """
+    progress = np.minimum(np.arange(1, n_periods + 1) / ramp_periods, 1)
+    base = initial_level + (1 - initial_level) * progress
+    return _dirichlet_around(rng, base, n_scenarios, concentration)
+
+
+# Period-weight generators by name. Each is called as generator(rng, n_scenarios, n_periods, **options)
+# and returns a (n_scenarios, n_periods) array whose rows sum up to 1
+WEIGHT_GENERATORS = {
+    'uniform': uniform_weights,
+    'dirichlet': dirichlet_weights,
+    'seasonal': seasonal_weights,
+    'ramp': ramp_weights
+}
+
+
+def period_weights(generator, n_scenarios, n_periods, rng=None, **options):
+    """
+    Weights of n_periods periods for n_scenarios scenarios at once, as a (n_scenarios, n_periods) array
+    whose rows sum up to 1.
+    :param generator: Name in WEIGHT_GENERATORS, or a function with the same signature.
+    :param rng: numpy Generator or seed.
+    """
+    if isinstance(generator, str):
+        if generator not in WEIGHT_GENERATORS:
+            raise ValueError(f"Invalid weight generator '{generator}'. Must be one of {list(WEIGHT_GENERATORS)}.")
+        generator = WEIGHT_GENERATORS[generator]
+    
+    return generator(np.random.default_rng(rng), n_scenarios, n_periods, **options)
+
+
+def _draw_weight_batch(seed_sequence, n_paths, forecast_periods, generator, options):
+    # Module-level so simulate_cashflows can send it to a process pool
+    return period_weights(generator, n_paths, forecast_periods, seed_sequence, **options)
+
+
+def _weight_options(generator, weight_options, denominator):
+    # The legacy uniform scheme is scaled by the model's denominator unless told otherwise
+    options = dict(weight_options or {})
+    if generator in ('uniform', uniform_weights):
+        options.setdefault('denominator', denominator)
+    return options
+
 
 class GeneralModel:
-    def create_cashflow_df(self, total_revenue, total_cost, period, period_to_forecast, period_type='monthly', fluctuate=True, denominator=100):
+    def _monthly_totals(self, total_revenue, total_cost, period, period_to_forecast, period_type):
         """
-        Create a fluctuative or stable monthly cashflow DataFrame.
-        If fluctuate=True, fluctuating values will be generated. 
-        If fluctuate=False, values will be evenly distributed across periods.
-        
-        'period' refers to the time span (in months or years) of the input total_revenue and total_cost.
+        Convert total_revenue and total_cost spanning 'period' months or years to monthly values,
+        and the forecast horizon to a number of months.
         """
         # Adjust the total_revenue and total_cost to be monthly values
         if period_type == 'yearly':
@@ -25,29 +164,68 @@ class GeneralModel:
             forecast_periods = period_to_forecast  # Already in months
         else:
             raise ValueError("Invalid period_type. Must be 'monthly' or 'yearly'.")
+        
+        return total_revenue, total_cost, forecast_periods
+    
+    def create_cashflow_df(self, total_revenue, total_cost, period, period_to_forecast, period_type='monthly', fluctuate=True, denominator=100,
+                           start_date=None, seed=None, rng=None, weights='uniform', weight_options=None):
+        """
+        Create a fluctuative or stable monthly cashflow DataFrame.
+        If fluctuate=True, fluctuating values will be generated. 
+        If fluctuate=False, values will be evenly distributed across periods.
+        
+        'period' refers to the time span (in months or years) of the input total_revenue and total_cost.
+        If start_date is given, a Date column labels each period with the last day of its month,
+        the first period being the month start_date falls in.
+        :param seed: Seed of the fluctuations, e.g. from cashflow_seed. The same inputs and seed give the same
+                     cashflow, which is then reused from the result cache.
+        :param rng: numpy Generator to draw the fluctuations from instead, e.g. one of spawn_rngs.
+        :param weights: How the totals are split over the periods when fluctuating: a name in WEIGHT_GENERATORS
+                        ('uniform' is the original scheme) or a generator function, called with weight_options.
+        """
+        weight_options = _weight_options(weights, weight_options, denominator)
+        
+        if seed is not None and rng is None:
+            # Seeded cashflows are deterministic, so an earlier identical call can be reused
+            cashflow_df = result_cache.get_or_compute(
+                ('GeneralModel.create_cashflow_df', total_revenue, total_cost, period, period_to_forecast, period_type,
+                 fluctuate, None if start_date is None else str(pd.Timestamp(start_date)), seed, repr(weights), weight_options),
+                lambda: self._create_cashflow_df(total_revenue, total_cost, period, period_to_forecast, period_type,
+                                                 fluctuate, start_date, np.random.default_rng(seed), weights, weight_options))
+            # The cached frame is shared, so callers get their own copy
+            return cashflow_df.copy()
+        
+        return self._create_cashflow_df(total_revenue, total_cost, period, period_to_forecast, period_type,
+                                        fluctuate, start_date, np.random.default_rng(rng), weights, weight_options)
+    
+    def program_cashflow_df(self, program, total_revenue, total_cost, period, period_to_forecast, period_type='monthly',
+                            seed_inputs=()):
+        """
+        Cashflow of a program page, seeded by the program and its inputs so the same scenario always gives
+        the same cashflow. Dirichlet weights avoid the near-empty last month of the uniform scheme.
+        :param program: Name of the program, e.g. 'school_outreach'.
+        :param seed_inputs: Other inputs the cashflow depends on besides the totals, e.g. the subscription length.
+        """
+        return self.create_cashflow_df(total_revenue, total_cost, period, period_to_forecast, period_type=period_type,
+                                       weights='dirichlet',
+                                       seed=cashflow_seed(program, total_revenue, total_cost, *seed_inputs))
+    
+    def _create_cashflow_df(self, total_revenue, total_cost, period, period_to_forecast, period_type, fluctuate,
+                            start_date, rng, weights, weight_options):
+        total_revenue, total_cost, forecast_periods = self._monthly_totals(
+            total_revenue, total_cost, period, period_to_forecast, period_type)
 
         # If fluctuate is True, apply fluctuation logic, otherwise apply equal distribution logic
         if fluctuate:
-            # Generate random volumes for the forecasted periods
-            random_volumes = np.random.randint(1, denominator, size=forecast_periods-1)  # Random volumes for all but the last period
-            final_volume = max(denominator - np.sum(random_volumes), 1)  # Ensure total sums up to denominator and no negatives
-            
-            # Append the final volume
-            volumes = np.append(random_volumes, final_volume)
-            
-            # Scale the volumes to ensure they sum up to the exact total
-            volumes = volumes / np.sum(volumes) * denominator
+            # Generate the share of each forecasted period in the totals
+            period_shares = period_weights(weights, 1, forecast_periods, rng, **weight_options)[0]
             
             total_revenue = total_revenue * forecast_periods  # Multiply by the number of forecast periods
             total_cost = total_cost * forecast_periods
             
-            # Calculate revenue and expense for each forecast period based on the volumes
-            revenue_per_denominator = total_revenue / denominator
-            expense_per_denominator = total_cost / denominator
-            
-            # Use the generated volumes to calculate revenue and expense for each forecasted period
-            revenue_list = revenue_per_denominator * volumes 
-            expense_list = expense_per_denominator * volumes 
+            # Use the generated shares to calculate revenue and expense for each forecasted period
+            revenue_list = total_revenue * period_shares
+            expense_list = total_cost * period_shares
             
         else:
             # If no fluctuation, evenly distribute the total revenue and cost over the forecast periods
@@ -61,10 +239,223 @@ class GeneralModel:
             'Expense': expense_list
         })
         
+        if start_date is not None:
+            # Month-end offsets behave the same across pandas versions, unlike the 'M'/'ME' aliases
+            cashflow_df['Date'] = pd.date_range(start=pd.Timestamp(start_date), periods=forecast_periods, freq=pd.offsets.MonthEnd())
+        
         return cashflow_df
 
+    def simulate_cashflows(self, total_revenue, total_cost, period, period_to_forecast, period_type='monthly',
+                           n_paths=10000, denominator=100, percentiles=(5, 50, 95), seed=None,
+                           n_workers=1, batch_size=10000, weights='uniform', weight_options=None):
+        """
+        Monte Carlo version of create_cashflow_df with fluctuate=True.
+        Draws n_paths cashflow paths as one (paths x periods) matrix and returns the percentile
+        bands of monthly revenue, expense, net cashflow and cumulative cashflow per period.
+        :param seed: Seed for reproducible paths. The same seed gives the same bands for any n_workers.
+        :param n_workers: Number of worker processes; batches of batch_size paths are drawn in parallel when > 1.
+        :param weights: Period-weight generator of the paths, see create_cashflow_df.
+        """
+        total_revenue, total_cost, forecast_periods = self._monthly_totals(
+            total_revenue, total_cost, period, period_to_forecast, period_type)
+        weight_options = _weight_options(weights, weight_options, denominator)
+        
+        # One independent random stream per batch, so results do not depend on how batches are scheduled
+        batch_sizes = [min(batch_size, n_paths - start) for start in range(0, n_paths, batch_size)]
+        seed_sequences = np.random.SeedSequence(seed).spawn(len(batch_sizes))
+        batch_args = [(seed_sequence, size, forecast_periods, weights, weight_options)
+                      for seed_sequence, size in zip(seed_sequences, batch_sizes)]
+        
+        if n_workers > 1 and len(batch_args) > 1:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                batches = list(executor.map(_draw_weight_batch, *zip(*batch_args)))
+        else:
+            batches = [_draw_weight_batch(*args) for args in batch_args]
+        
+        period_shares = np.vstack(batches)
+        
+        # Same scaling as create_cashflow_df: the totals over the forecast horizon split by period share
+        revenue_paths = total_revenue * forecast_periods * period_shares
+        expense_paths = total_cost * forecast_periods * period_shares
+        net_paths = revenue_paths - expense_paths
+        
+        series = {
+            'Revenue': revenue_paths,
+            'Expense': expense_paths,
+            'Net Cashflow': net_paths,
+            'Cumulative Cashflow': net_paths.cumsum(axis=1)
+        }
+        
+        bands = {'Period': np.arange(1, forecast_periods + 1)}
+        for name, paths in series.items():
+            for percentile, values in zip(percentiles, np.percentile(paths, percentiles, axis=0)):
+                bands[f'{name} P{percentile}'] = values
+        
+        return pd.DataFrame(bands)
+
+
+def step_values(initial_value, increment, steps=10, lower=None, upper=None):
+    """
+    Values from initial_value going up and down by increment for the given number of steps.
+    Upward steps above upper and downward steps below lower are dropped.
+    """
+    offsets = increment * np.arange(1, steps + 1)
+    up_values = initial_value + offsets
+    down_values = initial_value - offsets
+    
+    if upper is not None:
+        up_values = up_values[up_values <= upper]
+    if lower is not None:
+        down_values = down_values[down_values >= lower]
+    
+    return np.unique(np.concatenate([down_values, [initial_value], up_values]))
+
+
+class SensitivityCube:
+    """
+    Columnar result of a multi-variable sweep: one sorted value array per variable (axis)
+    and one N-dimensional array per metric, so 2-D heatmaps can be sliced without recomputing.
+    """
+    def __init__(self, axes, metrics, baseline=None):
+        self.axes = axes
+        self.metrics = metrics
+        self.baseline = baseline or {}
+        
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.axes.values())
+    
+    def to_frame(self, metrics=None):
+        """
+        Long-format DataFrame with one row per grid point, the first variable varying slowest.
+        """
+        metrics = list(self.metrics) if metrics is None else metrics
+        grids = np.meshgrid(*self.axes.values(), indexing='ij')
+        
+        frame = {var: grid.ravel() for var, grid in zip(self.axes, grids)}
+        frame.update({metric: self.metrics[metric].ravel() for metric in metrics})
+        
+        return pd.DataFrame(frame)
+    
+    def _axis_index(self, var, fixed):
+        values = self.axes[var]
+        target = fixed.get(var, self.baseline.get(var))
+        
+        # Without a fixed or baseline value, take the middle of the swept range
+        if target is None:
+            return len(values) // 2
+        
+        return int(np.abs(values - target).argmin())
+    
+    def slice(self, row_variable, column_variable, metric='Total Profit', fixed=None):
+        """
+        2-D matrix of a metric over two variables. The remaining variables are held at the value
+        given in fixed, else the baseline, else the middle of their range (nearest swept value).
+        """
+        fixed = fixed or {}
+        variables = list(self.axes)
+        
+        index = tuple(slice(None) if var in (row_variable, column_variable) else self._axis_index(var, fixed)
+                      for var in variables)
+        matrix = self.metrics[metric][index]
+        
+        if variables.index(row_variable) > variables.index(column_variable):
+            matrix = matrix.T
+        
+        return pd.DataFrame(matrix,
+                            index=pd.Index(self.axes[row_variable], name=row_variable),
+                            columns=pd.Index(self.axes[column_variable], name=column_variable))
+    
+    def heatmap(self, row_variable, column_variable, metric='Total Profit', fixed=None):
+        matrix = self.slice(row_variable, column_variable, metric, fixed)
+        
+        # Create the heatmap using Plotly, including the metric values as text in each cell
+        fig = go.Figure(data=go.Heatmap(
+            z=matrix.values,
+            x=matrix.columns,
+            y=matrix.index,
+            colorscale='Viridis',  # You can choose other color scales like 'Plasma', 'Cividis', etc.
+            colorbar=dict(title=metric),
+            text=matrix.values,
+            texttemplate="%{text:,}",  # Format the text to include thousand separators and no decimals
+            textfont={"size": 10}  # Adjust the size to make it more readable
+        ))
+
+        fig.update_layout(
+            title=f'Sensitivity Analysis of {metric}',
+            xaxis_title=column_variable,
+            yaxis_title=row_variable,
+            template='plotly_white'
+        )
+        
+        return fig
+
+
+def sweep_bounds(variable):
+    """
+    Lower and upper bound of a sensitivity variable: percentages lie in [0, 100], proportions
+    in [0, 1], and everything else (counts, frequencies, costs) is non-negative.
+    """
+    if variable.endswith('(%)'):
+        return 0, 100
+    if variable.startswith('Proportion '):
+        return 0, 1
+    return 0, None
+
+
+def sweep_grid(variable_values, evaluate, metrics, chunk_size=250000, baseline=None):
+    """
+    Evaluate every combination of the given variable values and return a SensitivityCube.
+    :param variable_values: Dict of variable name to the values to sweep, in axis order.
+    :param evaluate: Function taking a dict of variable name to an array of grid point values and
+                     returning a dict of metric to an array of results, one per grid point.
+    :param chunk_size: Number of grid points evaluated per batch, which bounds the working memory.
+    """
+    axes = {var: np.unique(np.asarray(values)) for var, values in variable_values.items()}
+    shape = tuple(len(values) for values in axes.values())
+    total_points = int(np.prod(shape))
+    
+    results = {metric: np.empty(total_points) for metric in metrics}
+    
+    # Evaluate the flattened grid in batches
+    for start in range(0, total_points, chunk_size):
+        stop = min(start + chunk_size, total_points)
+        grid_index = np.unravel_index(np.arange(start, stop), shape)
+        
+        evaluated = evaluate({var: values[index] for (var, values), index in zip(axes.items(), grid_index)})
+        
+        for metric in metrics:
+            results[metric][start:stop] = evaluated[metric]
+    
+    return SensitivityCube(axes, {metric: values.reshape(shape) for metric, values in results.items()}, baseline)
+
+
+def run_sweep_analysis(sweep, initial_values, variables, increments, steps=10, metric='Total Profit'):
+    """
+    Sweep two variables up and down from their initial values by the given increments, within
+    their sweep_bounds, and return the heatmap of the metric and the long-format results.
+    :param sweep: Function taking a dict of variable name to values and returning a SensitivityCube.
+    :param metric: Metric of the heatmap, one of the cube's metrics.
+    """
+    if variables[0] == variables[1]:
+        raise ValueError("Sensitivity analysis requires two different variables.")
+    
+    value_arrays = {var: step_values(initial_values[var], increments[i], steps, *sweep_bounds(var))
+                    for i, var in enumerate(variables)}
+    
+    cube = sweep(value_arrays)
+    
+    return cube.heatmap(variables[0], variables[1], metric), cube.to_frame()
+
+
 class ModelCorporateWellness:
-    def __init__(self):
+    # Cost component of the monthly member card, paid for every joining employee
+    CARD_COMPONENT = 'Member Card (monthly)'
+    
+    def __init__(self, data_root=None):
+        # Data directory, see data_registry.data_root
+        self.data_root = data_root
+        
         self.total_potential_employee = 0
         self.conversion_rate = 0
         self.treatments = []
@@ -88,18 +479,28 @@ class ModelCorporateWellness:
         
         if pricing_basis == 'Dr.Riesqi':
                     # Load treatment prices CSV
-            self.prices_df = pd.read_csv(r'corporate_wellness_data\treatment_prices.csv')
+            self.prices_df = registry.load('corporate_wellness_data', 'treatment_prices.csv', root=self.data_root)
             
             # Load treatment costs CSV
-            self.costs_df = pd.read_csv(r'corporate_wellness_data\treatment_costs.csv')
-            self.dsp_df = pd.read_csv(r'corporate_wellness_data\dsp.csv')
+            self.costs_df = registry.load('corporate_wellness_data', 'treatment_costs.csv', root=self.data_root)
+            self.dsp_df = registry.load('corporate_wellness_data', 'dsp.csv', root=self.data_root)
         
         elif pricing_basis == 'GAIA Indonesia':
-            self.prices_df = pd.read_csv(r'corporate_wellness_data\treatment_prices_GAIA_IDR.csv')
-            self.costs_df = pd.read_csv(r'corporate_wellness_data\treatment_costs_GAIA_IDR.csv')
-            self.dsp_df = pd.read_csv(r'corporate_wellness_data\dsp_GAIA_IDR.csv')
+            self.prices_df = registry.load('corporate_wellness_data', 'treatment_prices_GAIA_IDR.csv', root=self.data_root)
+            self.costs_df = registry.load('corporate_wellness_data', 'treatment_costs_GAIA_IDR.csv', root=self.data_root)
+            self.dsp_df = registry.load('corporate_wellness_data', 'dsp_GAIA_IDR.csv', root=self.data_root)
             
     
+    def unit_economics(self):
+        """
+        Per-treatment unit economics of the current prices and costs, see unit_economics.corporate_unit_economics.
+        """
+        return unit_economics_table('corporate', self.prices_df, self.costs_df)
+    
+    def _card_fee(self):
+        # Monthly member card fee, from the first member card row of the costs
+        return self.costs_df[self.costs_df['Component'] == self.CARD_COMPONENT]['Material Cost (Rp.)'].values[0]
+    
     def calculate_ARO(self, treatment_price_df=None, treatment_cost_df=None):
         # Get the price of selected treatments
         selected_treatments = self.treatments
@@ -109,14 +510,19 @@ class ModelCorporateWellness:
             # Use the edited treatment prices DataFrame
             self.prices_df = treatment_price_df
         
-        # Summing the prices of selected treatments
-        total_price = self.prices_df[self.prices_df['Treatment'].isin(selected_treatments)]['Price (Rp.)'].sum()
-        
-        # Calculate ARO
-        aro = (total_price * self.total_joining_employee
-               * (100 - self.discount_package) / 100 * (self.subscription_length * 12))
+        def compute():
+            # Summing the prices of selected treatments
+            unit_economics = self.unit_economics()
+            total_price = selection_vector(unit_economics, selected_treatments) @ unit_economics['Price (Rp.)'].to_numpy()
+            
+            # Calculate ARO
+            return (total_price * self.total_joining_employee
+                    * (100 - self.discount_package) / 100 * (self.subscription_length * 12))
         
-        return aro
+        # Reuse the result of an earlier call with the same prices and parameters
+        return result_cache.get_or_compute(
+            ('calculate_ARO', self.prices_df, list(selected_treatments), self.total_joining_employee,
+             self.discount_package, self.subscription_length), compute)
     
     def calculate_total_cost(self, treatment_cost_df=None):
         
@@ -128,80 +534,63 @@ class ModelCorporateWellness:
         # Get the cost of selected treatments
         selected_treatments = self.treatments
         
-        # Summing the material costs of selected treatments
-        material_cost = self.costs_df[self.costs_df['Component'].isin(selected_treatments)]['Material Cost (Rp.)'].sum()
-        
-        # Calculating total dentist fee based on treatment duration and dentist fee per hour
-        self.costs_df['Dentist Fee Total (Rp.)'] = (self.costs_df['Dentist Fee per Hour (Rp.)'] * 
-                                                    (self.costs_df['Duration (Min)'] / 60))
-        
-        dentist_fee_total = self.costs_df[self.costs_df['Component'].isin(selected_treatments)]['Dentist Fee Total (Rp.)'].sum()
-        
-        # Get the card fee (remains unchanged)
-        card_fee = self.costs_df[self.costs_df['Component'] == 'Member Card (monthly)']['Material Cost (Rp.)'].values[0]
-        
-        # Total cost per employee is now the sum of material cost, dentist fee, and monthly card fee
-        total_cost_per_employee = material_cost + dentist_fee_total + card_fee
-        
-        # Total cost is multiplied by the number of joining employees and subscription length
-        total_cost = (total_cost_per_employee * self.total_joining_employee
+        def compute():
+            unit_economics = self.unit_economics()
+            selection = selection_vector(unit_economics, selected_treatments)
+            
+            # Summing the material costs and the dentist fees (based on treatment duration and dentist fee per hour) of selected treatments
+            material_cost = selection @ unit_economics['Material Cost (Rp.)'].to_numpy()
+            dentist_fee_total = selection @ unit_economics['Dentist Fee (Rp.)'].to_numpy()
+            
+            # Get the card fee (remains unchanged)
+            card_fee = self._card_fee()
+            
+            # Total cost per employee is now the sum of material cost, dentist fee, and monthly card fee
+            total_cost_per_employee = material_cost + dentist_fee_total + card_fee
+            
+            # Total cost is multiplied by the number of joining employees and subscription length
+            return (total_cost_per_employee * self.total_joining_employee
                     * (self.subscription_length * 12))
         
-        return total_cost
+        # Reuse the result of an earlier call with the same costs and parameters
+        return result_cache.get_or_compute(
+            ('calculate_total_cost', self.costs_df, list(selected_treatments), self.total_joining_employee,
+             self.subscription_length), compute)
 
 
     def calculate_DSP(self, dsp_editor_df, total_joining_employee):
-        # Get the selected DSP treatments and their conversion rates and discount rates from the edited DSP editor
-        dsp_selected = dsp_editor_df[dsp_editor_df['Selected'] == True]
+        # Reuse the result of an earlier call with the same DSP table and joining employees
+        total_dsp_aro, total_dsp_cost, dsp_df_output = result_cache.get_or_compute(
+            ('calculate_DSP', dsp_editor_df, total_joining_employee),
+            lambda: self._compute_DSP(dsp_editor_df, total_joining_employee))
         
-        dsp_original_df = dsp_selected  # we will use the selected as it needs to be editable
+        # The cached frame is shared, so callers get their own copy
+        return total_dsp_aro, total_dsp_cost, dsp_df_output.copy()
+    
+    def _compute_DSP(self, dsp_editor_df, total_joining_employee):
+        # Get the per-customer price and cost inputs of the selected DSP treatments as arrays
+        dsp = self._dsp_unit_economics(dsp_editor_df)
         
-        total_dsp_aro = 0
-        total_dsp_cost = 0
+        # Calculate the new discounted prices, the dentist fees come from the unit economics
+        dsp_price = dsp['original_price'] * (1 - dsp['discount_rate'])
+        dsp_dentist_fee = dsp['dentist_fee']
         
-        dsp_output_data = {
-            "Treatment": [],
-            "Joining Customers": [],
-            "Total Revenue (Rp.)": [],
-            "Total Cost (Rp.)": []
-        }
+        dsp_total_joining = np.ceil(total_joining_employee * dsp['conversion_rate'])
         
-        # Iterate through the selected rows in dsp_editor_df
-        for _, row in dsp_selected.iterrows():
-            treatment_name = row['Treatment']
-            dsp_conversion_rate = row['Conversion Rate (%)'] / 100
-            discount_rate = row['Discount Price (%)'] / 100
-            
-            # Cross-reference with original dsp_df to get Original Price and Cost Material
-            original_row = dsp_original_df[dsp_original_df['Treatment'] == treatment_name].iloc[0]
-            original_price = original_row['Original Price (Rp.)']
-            dsp_cost_material = original_row['Cost Material (Rp.)']
-            duration_min = original_row['Duration (Min)']
-            dentist_fee_per_hour = original_row['Dentist Fee Per Hour (Rp.)']
-            
-            # Calculate the new discounted price
-            dsp_price = original_price * (1 - discount_rate)
-            
-            # Calculate the dentist fee based on duration and fee per hour
-            dsp_dentist_fee = (dentist_fee_per_hour * (duration_min / 60))
-            
-            dsp_total_joining = np.ceil(total_joining_employee * dsp_conversion_rate)
-            
-            # DSP ARO and cost calculations
-            dsp_aro = dsp_price * dsp_total_joining
-            dsp_cost = (dsp_cost_material + dsp_dentist_fee) * dsp_total_joining
-            
-            total_dsp_aro += dsp_aro
-            total_dsp_cost += dsp_cost
-            
-            # Add row to output data
-            dsp_output_data["Treatment"].append(treatment_name)
-            dsp_output_data["Joining Customers"].append(int(dsp_total_joining))
-            dsp_output_data["Total Revenue (Rp.)"].append(int(dsp_aro))
-            dsp_output_data["Total Cost (Rp.)"].append(int(dsp_cost))
+        # DSP ARO and cost calculations for all treatments at once
+        dsp_aro = dsp_price * dsp_total_joining
+        dsp_cost = (dsp['cost_material'] + dsp_dentist_fee) * dsp_total_joining
+        
+        total_dsp_aro = dsp_aro.sum()
+        total_dsp_cost = dsp_cost.sum()
         
-        # Create a DataFrame for output
-        dsp_df_output = pd.DataFrame(dsp_output_data)
+        # Create a DataFrame for output, truncating the amounts to whole Rupiah
+        dsp_df_output = pd.DataFrame({
+            "Treatment": dsp['treatment'],
+            "Joining Customers": dsp_total_joining.astype('int64'),
+            "Total Revenue (Rp.)": dsp_aro.astype('int64'),
+            "Total Cost (Rp.)": dsp_cost.astype('int64')
+        })
         
         return total_dsp_aro, total_dsp_cost, dsp_df_output
     
@@ -213,89 +602,370 @@ class ModelCorporateWellness:
     
 
 
-    def run_sensitivity_analysis(self, variables, increments):
-        results = []
+    # Sensitivity variables and the _evaluate_financials argument each of them drives
+    SWEEP_VARIABLES = {
+        "Conversion Rate (%)": 'conversion_rate',
+        "Discount Package (%)": 'discount_package',
+        "Total Potential Employee": 'total_potential_employee',
+        "Subscription Length (years)": 'subscription_length',
+        "DSP Conversion Rate (%)": 'dsp_conversion_rate',
+        "DSP Discount Price (%)": 'dsp_discount_price',
+        "Dentist Fee per Hour (Rp.)": 'dentist_fee_per_hour'
+    }
 
-        # Extract initial values for the selected variables
-        initial_values = {
-            "Conversion Rate (%)": self.conversion_rate,
-            "Discount Package (%)": self.discount_package,
-            "Total Potential Employee": self.total_potential_employee
+    def _package_unit_economics(self):
+        """
+        Per-employee monthly package price and cost components of the selected treatments.
+        These do not depend on the sensitivity variables, so they are computed once per run.
+        """
+        unit_economics = self.unit_economics()
+        selection = selection_vector(unit_economics, self.treatments)
+        
+        return {
+            'total_price': selection @ unit_economics['Price (Rp.)'].to_numpy(),
+            'material_cost': selection @ unit_economics['Material Cost (Rp.)'].to_numpy(),
+            'dentist_fee_total': selection @ unit_economics['Dentist Fee (Rp.)'].to_numpy(),
+            'duration_hours': selection @ unit_economics['Duration (Hours)'].to_numpy(),
+            'card_fee': self._card_fee()
         }
+    
+    def _dsp_unit_economics(self, dsp_editor_df):
+        """
+        Per-customer DSP price and cost inputs of every selected DSP treatment, as arrays.
+        Conversion and discount rates come from each selected row, while price, material cost,
+        duration and dentist fee come from the first selected row with the same treatment name.
+        """
+        dsp_selected = dsp_editor_df[dsp_editor_df['Selected'] == True]
+        original_rows = unit_economics_table('dsp', dsp_selected).loc[dsp_selected['Treatment']]
+        
+        return {
+            'treatment': dsp_selected['Treatment'].to_numpy(),
+            'original_price': original_rows['Price (Rp.)'].to_numpy(),
+            'discount_rate': dsp_selected['Discount Price (%)'].to_numpy(dtype=float) / 100,
+            'conversion_rate': dsp_selected['Conversion Rate (%)'].to_numpy(dtype=float) / 100,
+            'cost_material': original_rows['Material Cost (Rp.)'].to_numpy(),
+            'dentist_fee': original_rows['Dentist Fee (Rp.)'].to_numpy(),
+            'duration_hours': original_rows['Duration (Hours)'].to_numpy()
+        }
+    
+    def _evaluate_financials(self, conversion_rate=None, discount_package=None, total_potential_employee=None,
+                             subscription_length=None, dsp_conversion_rate=None, dsp_discount_price=None,
+                             dentist_fee_per_hour=None, unit_economics=None, dsp_conversion_scale=None):
+        """
+        Evaluate total revenue, cost and profit for arrays of parameter values at once.
+        The arguments are broadcast against each other, so passing meshgrid arrays evaluates
+        the whole grid in one go with the same arithmetic as calculate_ARO, calculate_total_cost
+        and calculate_DSP. Arguments left as None keep the model's current value; the DSP rates
+        and the dentist fee override the per-treatment values of every selected treatment.
+        dsp_conversion_scale multiplies the DSP conversion rates (capped at 100%), with a
+        trailing treatment axis.
+        """
+        if unit_economics is None:
+            unit_economics = (self._package_unit_economics(), self._dsp_unit_economics(self.dsp_df))
+        package, dsp = unit_economics
+        
+        scalars = [
+            self.conversion_rate if conversion_rate is None else conversion_rate,
+            self.discount_package if discount_package is None else discount_package,
+            self.total_potential_employee if total_potential_employee is None else total_potential_employee,
+            self.subscription_length if subscription_length is None else subscription_length
+        ]
+        conversion_rate, discount_package, total_potential_employee, subscription_length = np.broadcast_arrays(
+            *[np.asarray(value, dtype=float) for value in scalars])
+        
+        total_joining_employee = np.ceil(total_potential_employee * (conversion_rate / 100))
+        months = subscription_length * 12
+        
+        # Employee wellness package
+        if dentist_fee_per_hour is None:
+            dentist_fee_total = package['dentist_fee_total']
+        else:
+            dentist_fee_total = np.asarray(dentist_fee_per_hour, dtype=float) * package['duration_hours']
+        total_cost_per_employee = package['material_cost'] + dentist_fee_total + package['card_fee']
+        
+        first_aro_revenue = package['total_price'] * total_joining_employee * (100 - discount_package) / 100 * months
+        first_cost = np.round(total_cost_per_employee * total_joining_employee * months, 0)
+        
+        # DSP per treatment, trailing axis is the treatment
+        def per_treatment(value, default, scale=1):
+            if value is None:
+                return default
+            return np.asarray(value, dtype=float)[..., np.newaxis] / scale
+        
+        dsp_price = dsp['original_price'] * (1 - per_treatment(dsp_discount_price, dsp['discount_rate'], 100))
+        if dentist_fee_per_hour is None:
+            dsp_dentist_fee = dsp['dentist_fee']
+        else:
+            dsp_dentist_fee = np.asarray(dentist_fee_per_hour, dtype=float)[..., np.newaxis] * dsp['duration_hours']
+        dsp_conversion = per_treatment(dsp_conversion_rate, dsp['conversion_rate'], 100)
+        if dsp_conversion_scale is not None:
+            dsp_conversion = np.minimum(dsp_conversion * dsp_conversion_scale, 1)
+        dsp_total_joining = np.ceil(total_joining_employee[..., np.newaxis] * dsp_conversion)
+        
+        total_dsp_aro = (dsp_price * dsp_total_joining).sum(axis=-1)
+        total_dsp_cost = ((dsp['cost_material'] + dsp_dentist_fee) * dsp_total_joining).sum(axis=-1)
+        
+        total_revenue = first_aro_revenue + total_dsp_aro
+        total_cost = np.round(first_cost + total_dsp_cost, 0)
+        total_profit = total_revenue - total_cost
+        
+        return np.broadcast_arrays(total_revenue, total_cost, total_profit)
 
-        # Generate arrays for both variables with 10 points up and down
-        value_arrays = {}
-        for i, var in enumerate(variables):
-            initial_value = initial_values[var]
-            increment = increments[i]
-
-            # Create an array for increasing values, bounded by the max limit (100 for percentages)
-            up_values = [initial_value + increment * n for n in range(1, 11) if initial_value + increment * n <= 100]
-
-            # Create an array for decreasing values, bounded by the min limit (0 for percentages)
-            down_values = [initial_value - increment * n for n in range(1, 11) if initial_value - increment * n >= 0]
-
-            value_arrays[var] = sorted(down_values + [initial_value] + up_values)
-
-        # Iterate over all combinations of variable values
-        for value1 in value_arrays[variables[0]]:
-            for value2 in value_arrays[variables[1]]:
-                # Update the object's attributes based on the selected variables
-                if variables[0] == "Conversion Rate (%)":
-                    self.conversion_rate = value1
-                elif variables[0] == "Discount Package (%)":
-                    self.discount_package = value1
-                elif variables[0] == "Total Potential Employee":
-                    self.total_potential_employee = value1
-
-                if variables[1] == "Conversion Rate (%)":
-                    self.conversion_rate = value2
-                elif variables[1] == "Discount Package (%)":
-                    self.discount_package = value2
-                elif variables[1] == "Total Potential Employee":
-                    self.total_potential_employee = value2
-                    
-                self.total_joining_employee = np.ceil(self.total_potential_employee * (self.conversion_rate / 100))
-
-                # Recalculate the financial metrics
-                first_aro_revenue = self.calculate_ARO()
-                total_dsp_aro, total_dsp_cost, dsp_df_output = self.calculate_DSP(self.dsp_df, self.total_joining_employee)
-                total_revenue = first_aro_revenue + total_dsp_aro
-                
-                first_cost = round(self.calculate_total_cost(), 0)
-                total_cost = round(first_cost + total_dsp_cost, 0)
-
-                total_profit = total_revenue - total_cost
-
-                # Store the results in a list
-                results.append([value1, value2, total_revenue, total_cost ,total_profit])
-
-        # Create the results DataFrame
-        results_df = pd.DataFrame(results, columns=[variables[0], variables[1], 'Total Revenue' , 'Total Cost' ,'Total Profit'])
-
-        # Pivot the DataFrame to create a matrix format suitable for a heatmap
-        profit_matrix = results_df.pivot(index=variables[0], columns=variables[1], values='Total Profit')
-
-        # Create the heatmap using Plotly, including the profit values as text in each cell
-        fig = go.Figure(data=go.Heatmap(
-            z=profit_matrix.values,
-            x=profit_matrix.columns,
-            y=profit_matrix.index,
-            colorscale='Viridis',  # You can choose other color scales like 'Plasma', 'Cividis', etc.
-            colorbar=dict(title='Total Profit'),
-            text=profit_matrix.values,
-            texttemplate="%{text:,}",  # Format the text to include thousand separators and no decimals
-            textfont={"size": 10}  # Adjust the size to make it more readable
-        ))
+    def sweep(self, variable_values, metrics=('Total Revenue', 'Total Cost', 'Total Profit'), chunk_size=250000):
+        """
+        Evaluate every combination of the given variable values and return a SensitivityCube.
+        :param variable_values: Dict of SWEEP_VARIABLES name to the values to sweep, in axis order.
+        :param metrics: Metrics to keep in the cube.
+        :param chunk_size: Number of grid points evaluated per batch, which bounds the working memory.
+        """
+        unknown = [var for var in variable_values if var not in self.SWEEP_VARIABLES]
+        if unknown:
+            raise ValueError(f"Unknown sweep variables: {unknown}. Must be among {list(self.SWEEP_VARIABLES)}.")
+        
+        unit_economics = (self._package_unit_economics(), self._dsp_unit_economics(self.dsp_df))
+        
+        def evaluate(grid_values):
+            parameters = {self.SWEEP_VARIABLES[var]: values for var, values in grid_values.items()}
+            evaluated = self._evaluate_financials(unit_economics=unit_economics, **parameters)
+            return dict(zip(('Total Revenue', 'Total Cost', 'Total Profit'), evaluated))
+        
+        return sweep_grid(variable_values, evaluate, metrics, chunk_size, self.sweep_baseline())
 
-        fig.update_layout(
-            title='Sensitivity Analysis of Total Profit',
-            xaxis_title=variables[1],
-            yaxis_title=variables[0],
-            template='plotly_white'
-        )
+    def sweep_baseline(self):
+        # Current value of each sweep variable with a model parameter
+        return {
+            "Conversion Rate (%)": self.conversion_rate,
+            "Discount Package (%)": self.discount_package,
+            "Total Potential Employee": self.total_potential_employee,
+            "Subscription Length (years)": self.subscription_length
+        }
+    
+    def run_sensitivity_analysis(self, variables, increments, steps=10):
+        # Evaluate the whole profit surface as array operations
+        return run_sweep_analysis(self.sweep, self.sweep_baseline(), variables, increments, steps)
 
-        return fig, results_df
+    def _treatment_unit_economics(self, treatments):
+        """
+        Per-employee monthly price, material cost, dentist fee and duration of each of the given
+        treatments, as arrays in the same order. Rows sharing a treatment name are summed, as in
+        calculate_ARO and calculate_total_cost.
+        """
+        treatment_values = self.unit_economics().reindex(treatments, fill_value=0)
+        
+        return {
+            'price': treatment_values['Price (Rp.)'].to_numpy(),
+            'material_cost': treatment_values['Material Cost (Rp.)'].to_numpy(),
+            'dentist_fee_total': treatment_values['Dentist Fee (Rp.)'].to_numpy(),
+            'duration_hours': treatment_values['Duration (Hours)'].to_numpy()
+        }
+    
+    def optimize(self, candidate_treatments=None, discount_packages=np.arange(0, 51), dsp_discount_prices=np.arange(0, 51),
+                 conversion_elasticity=0.0, target_margin=None):
+        """
+        Search the package discount, the DSP discount and the treatment selection for the most
+        profitable program or, with a target_margin (%), for the largest revenue at that margin or above.
+        Every discount point above (below) the current discount raises (lowers) the package conversion
+        rate, and the conversion rate of each selected DSP treatment, by conversion_elasticity percent
+        of itself; without elasticity the smallest discounts are always the most profitable.
+        
+        The joining employees do not depend on the treatment selection, so for each package discount the
+        best package holds exactly the treatments with a positive monthly unit margin (or the least
+        unprofitable one if none has). Only the two discounts are searched, as one vectorized grid.
+        :param candidate_treatments: Treatments the package may hold, all priced treatments by default.
+        :param discount_packages: Package discounts (%) to search.
+        :param dsp_discount_prices: DSP discounts (%) to search, applied to every selected DSP treatment.
+        :return: Dict with the best treatments, discounts, conversion rates (%), joining employees,
+                 financials and profit margin (%), and whether the target margin is met.
+        """
+        # A treatment listed twice is still one treatment of the package
+        if candidate_treatments is None:
+            candidate_treatments = self.prices_df['Treatment']
+        candidate_treatments = pd.unique(pd.Series(candidate_treatments)).tolist()
+        
+        treatments = self._treatment_unit_economics(candidate_treatments)
+        package, dsp = self._package_unit_economics(), self._dsp_unit_economics(self.dsp_df)
+        
+        discount_package = np.asarray(discount_packages, dtype=float)
+        dsp_discount_price = np.asarray(dsp_discount_prices, dtype=float)
+        
+        # Closed-form treatment selection per package discount, (discounts, treatments)
+        unit_margin = (treatments['price'] * (100 - discount_package[:, np.newaxis]) / 100
+                       - treatments['material_cost'] - treatments['dentist_fee_total'])
+        selected = unit_margin > 0
+        selected[np.arange(len(discount_package)), unit_margin.argmax(axis=1)] |= ~selected.any(axis=1)
+        
+        # Package of each discount, as a column against the DSP discount axis
+        package_grid = dict(package, **{component: (selected * treatments[key]).sum(axis=1)[:, np.newaxis]
+                                        for component, key in [('total_price', 'price'), ('material_cost', 'material_cost'),
+                                                               ('dentist_fee_total', 'dentist_fee_total'),
+                                                               ('duration_hours', 'duration_hours')]})
+        
+        # Joining rates following the discounts
+        conversion_rate = np.clip(self.conversion_rate * (1 + conversion_elasticity * (discount_package - self.discount_package) / 100),
+                                  0, 100)[:, np.newaxis]
+        dsp_conversion_scale = np.maximum(
+            1 + conversion_elasticity * (dsp_discount_price[:, np.newaxis] - dsp['discount_rate'] * 100) / 100, 0)
+        
+        total_revenue, total_cost, total_profit = self._evaluate_financials(
+            conversion_rate=conversion_rate, discount_package=discount_package[:, np.newaxis],
+            dsp_discount_price=dsp_discount_price[np.newaxis, :], dsp_conversion_scale=dsp_conversion_scale[np.newaxis],
+            unit_economics=(package_grid, dsp))
+        
+        profit_margin = np.divide(total_profit, total_revenue, out=np.full(total_profit.shape, -np.inf),
+                                  where=total_revenue > 0) * 100
+        
+        if target_margin is None:
+            target_met = True
+            best = np.argmax(total_profit)
+        else:
+            feasible = profit_margin >= target_margin
+            target_met = bool(feasible.any())
+            # The largest revenue at the target margin, or the closest margin when it cannot be reached
+            best = np.argmax(np.where(feasible, total_revenue, -np.inf)) if target_met else np.argmax(profit_margin)
+        i, j = np.unravel_index(best, total_profit.shape)
+        
+        return {
+            'treatments': [treatment for treatment, is_selected in zip(candidate_treatments, selected[i]) if is_selected],
+            'discount_package': discount_package[i],
+            'conversion_rate': conversion_rate[i, 0],
+            'dsp_discount_price': dsp_discount_price[j],
+            'dsp_conversion_rates': np.minimum(dsp['conversion_rate'] * dsp_conversion_scale[j], 1) * 100,
+            'total_joining_employee': np.ceil(self.total_potential_employee * (conversion_rate[i, 0] / 100)),
+            'total_revenue': total_revenue[i, j],
+            'total_cost': total_cost[i, j],
+            'total_profit': total_profit[i, j],
+            'profit_margin': profit_margin[i, j],
+            'target_met': target_met
+        }
+    
+    def rank_bundles(self, candidate_treatments=None, top_k=10, min_price=None, max_price=None, discount_package=None,
+                     chunk_bits=16):
+        """
+        Rank every non-empty subset of the candidate treatments as a package by its monthly profit per
+        joining employee, keeping the top_k. Subsets are indexed by bitmask (bit i set when the i-th
+        candidate is in the package) and their price and cost sums are built from precomputed vectors,
+        2**chunk_bits subsets at a time: the sums of the low bits are tabulated once and each chunk adds
+        the sums of its high bits.
+        :param min_price: Lowest monthly package price per employee (after the discount) to keep.
+        :param max_price: Highest monthly package price per employee (after the discount) to keep.
+        :param discount_package: Package discount (%), the model's current discount by default.
+        :return: DataFrame of the best packages, most profitable first.
+        """
+        # A treatment listed twice is still one treatment of the package
+        if candidate_treatments is None:
+            candidate_treatments = self.prices_df['Treatment']
+        candidate_treatments = pd.unique(pd.Series(candidate_treatments)).tolist()
+        if discount_package is None:
+            discount_package = self.discount_package
+        
+        n_treatments = len(candidate_treatments)
+        if n_treatments > 30:
+            raise ValueError(f"Too many candidate treatments ({n_treatments}), at most 30 can be enumerated.")
+        
+        treatments = self._treatment_unit_economics(candidate_treatments)
+        card_fee = self._package_unit_economics()['card_fee']
+        
+        # Per-treatment values summed over each subset, as rows
+        values = np.stack([treatments['price'] * (100 - discount_package) / 100,
+                           treatments['material_cost'] + treatments['dentist_fee_total']])
+        
+        # Sums of every combination of the low bits, built by doubling
+        low_bits = min(n_treatments, chunk_bits)
+        low_sums = np.zeros((2, 1))
+        for i in range(low_bits):
+            low_sums = np.concatenate([low_sums, low_sums + values[:, i:i + 1]], axis=1)
+        low_masks = np.arange(2 ** low_bits, dtype=np.int64)
+        
+        best_masks = np.empty(0, dtype=np.int64)
+        best_profit = np.empty(0)
+        
+        for high in range(2 ** (n_treatments - low_bits)):
+            high_bits = (high >> np.arange(n_treatments - low_bits)) & 1
+            price, cost = low_sums + (values[:, low_bits:] @ high_bits)[:, np.newaxis]
+            masks = (high << low_bits) | low_masks
+            profit = price - cost - card_fee
+            
+            keep = masks != 0
+            if min_price is not None:
+                keep &= price >= min_price
+            if max_price is not None:
+                keep &= price <= max_price
+            
+            # Running top-k, ties going to the lower bitmask
+            masks = np.concatenate([best_masks, masks[keep]])
+            profit = np.concatenate([best_profit, profit[keep]])
+            if len(masks) > top_k:
+                threshold = np.partition(profit, len(profit) - top_k)[len(profit) - top_k]
+                candidates = np.flatnonzero(profit >= threshold)
+                candidates = candidates[np.lexsort((masks[candidates], -profit[candidates]))][:top_k]
+                masks, profit = masks[candidates], profit[candidates]
+            best_masks, best_profit = masks, profit
+        
+        order = np.lexsort((best_masks, -best_profit))
+        best_masks = best_masks[order]
+        selected = ((best_masks[:, np.newaxis] >> np.arange(n_treatments)) & 1).astype(bool)
+        price, cost = values @ selected.T
+        
+        return pd.DataFrame({
+            'Treatments': [', '.join(np.asarray(candidate_treatments)[row]) for row in selected],
+            'Number of Treatments': selected.sum(axis=1),
+            'Package Price (Rp.)': price,
+            'Cost per Employee (Rp.)': cost + card_fee,
+            'Profit per Employee (Rp.)': price - cost - card_fee
+        })
+    
+    def break_even(self, fixed_cost=0, chunk_size=1000000):
+        """
+        Minimum number of joining employees for which the total profit of the current program covers
+        fixed_cost, and the potential employees needed to reach it at the current conversion rate.
+        Returns (None, None) when the program never breaks even. Since DSP customers are rounded up, a
+        program losing money per employee may still break even at a few joining employees.
+        """
+        unit_economics = (self._package_unit_economics(), self._dsp_unit_economics(self.dsp_df))
+        package, dsp = unit_economics
+        
+        # Profit per joining employee, apart from rounding each DSP treatment's customers up
+        months = self.subscription_length * 12
+        package_margin = (package['total_price'] * (100 - self.discount_package) / 100
+                          - package['material_cost'] - package['dentist_fee_total'] - package['card_fee']) * months
+        dsp_margin = (dsp['original_price'] * (1 - dsp['discount_rate'])
+                      - dsp['cost_material'] - dsp['dentist_fee'])
+        marginal_profit = package_margin + (dsp_margin * dsp['conversion_rate']).sum()
+        
+        if marginal_profit > 0:
+            # Rounding up costs at most one customer's loss per DSP treatment (and half a Rupiah), which bounds the search
+            max_joining = int(np.ceil((fixed_cost + np.abs(np.minimum(dsp_margin, 0)).sum() + 1) / marginal_profit)) + 1
+        elif marginal_profit < 0:
+            # Rounding up gains at most one customer's margin per DSP treatment, so only the small counts
+            # where that gain still outweighs the losses can break even
+            max_joining = int(np.floor((np.maximum(dsp_margin, 0).sum() + 1 - fixed_cost) / -marginal_profit))
+        else:
+            # Without a trend, the profit repeats with the rounding of the DSP customers, once every
+            # common denominator of the DSP conversion rates
+            max_joining = int(np.lcm.reduce([Fraction(float(rate)).limit_denominator(10000).denominator
+                                             for rate in dsp['conversion_rate']] + [1]))
+        
+        # Evaluate every joining count at once, in batches, with everyone converting
+        for start in range(1, max_joining + 1, chunk_size):
+            joining = np.arange(start, min(start + chunk_size, max_joining + 1))
+            _, _, total_profit = self._evaluate_financials(conversion_rate=100, total_potential_employee=joining,
+                                                           unit_economics=unit_economics)
+            reached = np.flatnonzero(total_profit >= fixed_cost)
+            if len(reached):
+                break
+        else:
+            return None, None
+        min_joining = int(joining[reached[0]])
+        
+        if self.conversion_rate <= 0:
+            return min_joining, None
+        
+        # Smallest workforce whose joining employees, rounded up, reach the break-even count
+        min_potential = int(np.floor((min_joining - 1) * 100 / self.conversion_rate)) + 1
+        while np.ceil(min_potential * (self.conversion_rate / 100)) < min_joining:
+            min_potential += 1
+        
+        return min_joining, min_potential
 
 
 
@@ -304,7 +974,14 @@ class ModelCorporateWellness:
 
 
 class ModelSchoolOutreach:
-    def __init__(self, converting_students, converting_parents, converting_students_no_parents, discount_single, discount_family):
+    # Proportion of converting students by number of converting parents, as in the School Outreach page
+    DEFAULT_PARENT_PROPORTIONS = {0: 0.3, 1: 0.5, 2: 0.15, 3: 0.05}
+    
+    def __init__(self, converting_students, converting_parents, converting_students_no_parents, discount_single, discount_family,
+                 treatment_prices_df=None, event_cost_df=None, data_root=None):
+        # Data directory, see data_registry.data_root
+        self.data_root = data_root
+        
         self.converting_students = converting_students
         self.converting_parents = converting_parents
         self.total_converting = converting_students + converting_parents
@@ -316,9 +993,16 @@ class ModelSchoolOutreach:
         self.discount_single = discount_single
         self.discount_family = discount_family
         
-        # Load the treatment prices CSV
-        self.treatment_prices_df = pd.read_csv(r'school_outreach_data\treatment_prices_new.csv')
-        self.event_cost_df = pd.read_csv(r'school_outreach_data\event_cost.csv')
+        # Load the treatment prices CSV, unless already loaded data is shared in
+        if treatment_prices_df is None:
+            treatment_prices_df = registry.load('school_outreach_data', 'treatment_prices_new.csv', root=self.data_root)
+        if event_cost_df is None:
+            event_cost_df = registry.load('school_outreach_data', 'event_cost.csv', root=self.data_root)
+        self.treatment_prices_df = treatment_prices_df
+        self.event_cost_df = event_cost_df
+        
+        # Per-package breakdown of the last calculate_financials call
+        self.package_financials = None
 
     def initial_price_df(self):
         # Prepare the DataFrame and add discount columns
@@ -362,7 +1046,7 @@ class ModelSchoolOutreach:
         df['Adjusted Price Family (Rp.)'] = df['Original Price (Rp.)'] * (1 - (df['Discount Family (%)'] / 100))
         
         # Calculate the new dentist fee based on total duration and fee per hour
-        df['Dentist Fee (Rp.)'] = (df['total_duration'] / 60) * df['Dentist Fee per Hour']
+        df['Dentist Fee (Rp.)'] = dentist_fee(df['Dentist Fee per Hour'], df['total_duration'])
         
         # Select and rename columns to create the final price_df
         price_df = df[['Treatment', 'Category', 'Adjusted Price Single (Rp.)', 'Adjusted Price Family (Rp.)', 
@@ -370,51 +1054,69 @@ class ModelSchoolOutreach:
         
         return price_df
 
+    @staticmethod
+    def _package_incidence(package_df, treatment_keys):
+        """
+        Number of times each (Treatment, Category) of treatment_keys appears in each package's
+        Description, as a (packages, treatments) matrix, so package sums of per-treatment values
+        are dot products. Treatments without a matching key are skipped.
+        :param treatment_keys: Unique (Treatment, Category) MultiIndex.
+        """
+        # One row per (package, treatment), keeping the package position
+        package_treatments = pd.DataFrame({
+            'Package Index': np.arange(len(package_df)),
+            'Treatment': package_df['Description'].str.split(', ').to_numpy(),
+            'Category': package_df['Category'].to_numpy()
+        }).explode('Treatment')
+        
+        treatment_index = treatment_keys.get_indexer(pd.MultiIndex.from_arrays(
+            [package_treatments['Treatment'].to_numpy(), package_treatments['Category'].to_numpy()]))
+        matched = treatment_index >= 0
+        
+        incidence = np.zeros((len(package_df), len(treatment_keys)))
+        np.add.at(incidence, (package_treatments['Package Index'].to_numpy()[matched], treatment_index[matched]), 1)
+        return incidence
+    
+    def calculate_package_financials(self, price_df, package_demand_df):
+        """
+        Revenue, cost and profit per package, from the package prices and unit costs summed over
+        each package's treatments as dot products with the (Treatment, Category) rows of price_df.
+        """
+        # Only the first row of each (Treatment, Category) is used
+        treatment_values = price_df.drop_duplicates(subset=['Treatment', 'Category']).set_index(['Treatment', 'Category'])
+        incidence = self._package_incidence(package_demand_df, treatment_values.index)
+        
+        price_single = incidence @ treatment_values['Adjusted Price Single (Rp.)'].to_numpy(dtype=float)
+        price_family = incidence @ treatment_values['Adjusted Price Family (Rp.)'].to_numpy(dtype=float)
+        unit_cost = incidence @ (treatment_values['Cost Material (Rp.)'] + treatment_values['Dentist Fee (Rp.)']).to_numpy(dtype=float)
+        
+        demand_single = package_demand_df['Demand with Single Discount'].to_numpy(dtype=float)
+        demand_family = package_demand_df['Demand with Family Discount'].to_numpy(dtype=float)
+        
+        package_financials = package_demand_df.reset_index(drop=True)[['Treatment Package', 'Category']].copy()
+        
+        # Calculate revenue and cost for single and family discounts
+        package_financials['Revenue Single (Rp.)'] = price_single * demand_single
+        package_financials['Revenue Family (Rp.)'] = price_family * demand_family
+        package_financials['Total Revenue (Rp.)'] = package_financials['Revenue Single (Rp.)'] + package_financials['Revenue Family (Rp.)']
+        package_financials['Total Cost (Rp.)'] = unit_cost * demand_single + unit_cost * demand_family
+        package_financials['Total Profit (Rp.)'] = package_financials['Total Revenue (Rp.)'] - package_financials['Total Cost (Rp.)']
+        
+        return package_financials
+
     def calculate_financials(self, price_df, package_demand_df, total_event_cost, event_frequency):
-        # Initialize total revenue, total cost, and total profit variables
-        total_revenue = 0
-        total_cost = 0
-        total_profit = 0
-        
-        # Iterate over each package in package_demand_df
-        for _, package_row in package_demand_df.iterrows():
-            # Get the package treatments from the Description column
-            package_treatments = package_row['Description'].split(', ')
-            
-            # Get the demands for single and family discount
-            demand_single = package_row['Demand with Single Discount']
-            demand_family = package_row['Demand with Family Discount']
-            
-            # Filter the price_df to get the relevant treatments for this package
-            for treatment in package_treatments:
-                treatment_price_row = price_df[(price_df['Treatment'] == treatment) & (price_df['Category'] == package_row['Category'])]
-                
-                if not treatment_price_row.empty:
-                    # Extract prices and costs
-                    adjusted_price_single = treatment_price_row['Adjusted Price Single (Rp.)'].values[0]
-                    adjusted_price_family = treatment_price_row['Adjusted Price Family (Rp.)'].values[0]
-                    cost_material = treatment_price_row['Cost Material (Rp.)'].values[0]
-                    dentist_fee = treatment_price_row['Dentist Fee (Rp.)'].values[0]
-                    
-                    # Calculate revenue for single and family discounts
-                    revenue_single = adjusted_price_single * demand_single
-                    revenue_family = adjusted_price_family * demand_family
-                    
-                    # Calculate cost for single and family discounts
-                    cost_single = (cost_material + dentist_fee) * demand_single
-                    cost_family = (cost_material + dentist_fee) * demand_family
-                    
-                    # Calculate profit for single and family discounts
-                    profit_single = revenue_single - cost_single
-                    profit_family = revenue_family - cost_family
-                    
-                    # Add to totals
-                    total_revenue += revenue_single + revenue_family
-                    total_cost += cost_single + cost_family
-                    total_profit += profit_single + profit_family
+        # Per-package breakdown, kept on the model for display. Reuses the breakdown of an earlier
+        # call with the same prices and demand; the cached frame is shared, so the model keeps a copy
+        package_financials = result_cache.get_or_compute(
+            ('ModelSchoolOutreach.calculate_package_financials', price_df, package_demand_df),
+            lambda: self.calculate_package_financials(price_df, package_demand_df))
+        self.package_financials = package_financials.copy()
+        
+        total_revenue = self.package_financials['Total Revenue (Rp.)'].sum()
+        total_profit = self.package_financials['Total Profit (Rp.)'].sum()
         
         # Add event costs to total cost
-        total_cost += total_event_cost * event_frequency
+        total_cost = self.package_financials['Total Cost (Rp.)'].sum() + total_event_cost * event_frequency
         
         # Return the overall financials
         return total_revenue, total_cost, total_profit
@@ -424,13 +1126,137 @@ class ModelSchoolOutreach:
     def initial_event_cost_df(self):
         return self.event_cost_df
     
+    @classmethod
+    def evaluate_schools(cls, schools_df, package_list_df, treatment_prices_df=None, event_cost_df=None, data_root=None):
+        """
+        Package demand and financials for many schools at once, with the pricing data loaded once.
+        :param schools_df: One row per school with 'Total Students', 'Conversion Rate (%)', 'Event Frequency',
+            'Discount Single (%)' and 'Discount Family (%)' columns, and optionally 'Proportion <n> Parents'
+            columns (fractions) for the share of converting students with n converting parents.
+            Schools without those columns use DEFAULT_PARENT_PROPORTIONS.
+        :param package_list_df: Package list as in school_outreach_data/package_list.csv.
+        :param data_root: Data directory to load the pricing data from, see data_registry.data_root.
+        :return: schools_df with the converting counts, demand and financials of each school appended.
+        """
+        if treatment_prices_df is None:
+            treatment_prices_df = registry.load('school_outreach_data', 'treatment_prices_new.csv', root=data_root)
+        if event_cost_df is None:
+            event_cost_df = registry.load('school_outreach_data', 'event_cost.csv', root=data_root)
+        
+        total_event_cost = (event_cost_df['Unit'] * event_cost_df['Cost per Unit (Rp.)']).sum()
+        
+        # Converting students and parents per school, rounded as in the School Outreach page
+        proportion_columns = {int(column.split()[1]): column for column in schools_df.columns
+                              if column.startswith('Proportion ') and column.endswith(' Parents')}
+        if proportion_columns:
+            parent_counts = np.array(sorted(proportion_columns), dtype=float)
+            proportions = schools_df[[proportion_columns[count] for count in sorted(proportion_columns)]].to_numpy(dtype=float)
+        else:
+            parent_counts = np.array(list(cls.DEFAULT_PARENT_PROPORTIONS), dtype=float)
+            proportions = np.tile(list(cls.DEFAULT_PARENT_PROPORTIONS.values()), (len(schools_df), 1))
+        no_parent_proportion = proportions[:, parent_counts == 0].sum(axis=1)
+        
+        converting_students = np.round(schools_df['Total Students'].to_numpy(dtype=float)
+                                       * schools_df['Conversion Rate (%)'].to_numpy(dtype=float) / 100)
+        converting_parents = np.round((converting_students[:, np.newaxis] * proportions * parent_counts).sum(axis=1))
+        students_no_parents = np.round(converting_students * no_parent_proportion)
+        students_with_parents = converting_students + converting_parents - students_no_parents
+        
+        # Demand per (school, package); single discount only applies to student packages
+        is_student = (package_list_df['Category'] == 'Student').to_numpy()
+        rate_single = package_list_df['Conversion Rate Single (%)'].to_numpy(dtype=float) / 100
+        rate_family = package_list_df['Conversion Rate Family (%)'].to_numpy(dtype=float) / 100
+        demand_single = np.trunc(students_no_parents[:, np.newaxis] * rate_single) * is_student
+        demand_family = np.trunc(students_with_parents[:, np.newaxis] * rate_family)
+        
+        # Original price and unit cost summed per package
+        unit_economics = unit_economics_table('school', treatment_prices_df)
+        incidence = cls._package_incidence(package_list_df, unit_economics.index)
+        package_price = incidence @ unit_economics['Price (Rp.)'].to_numpy()
+        package_cost = incidence @ unit_economics['Unit Cost (Rp.)'].to_numpy()
+        
+        discount_single = schools_df['Discount Single (%)'].to_numpy(dtype=float) / 100
+        discount_family = schools_df['Discount Family (%)'].to_numpy(dtype=float) / 100
+        
+        total_revenue = (demand_single @ package_price * (1 - discount_single)
+                         + demand_family @ package_price * (1 - discount_family))
+        treatment_cost = (demand_single + demand_family) @ package_cost
+        event_cost = total_event_cost * schools_df['Event Frequency'].to_numpy(dtype=float)
+        
+        results_df = schools_df.copy()
+        results_df['Converting Students'] = converting_students.astype('int64')
+        results_df['Converting Parents'] = converting_parents.astype('int64')
+        results_df['Students without Parents'] = students_no_parents.astype('int64')
+        results_df['Total Demand'] = (demand_single + demand_family).sum(axis=1).astype('int64')
+        results_df['Total Revenue (Rp.)'] = total_revenue
+        results_df['Event Cost (Rp.)'] = event_cost
+        results_df['Total Cost (Rp.)'] = treatment_cost + event_cost
+        # Profit excludes event costs, as in calculate_financials
+        results_df['Total Profit (Rp.)'] = total_revenue - treatment_cost
+        
+        return results_df
+    
+    # Columns of evaluate_schools' schools_df that can be swept, besides the 'Proportion <n> Parents' columns
+    SWEEP_VARIABLES = ["Total Students", "Conversion Rate (%)", "Event Frequency", "Discount Single (%)", "Discount Family (%)"]
+    
+    @classmethod
+    def sweep(cls, baseline, variable_values, package_list_df, treatment_prices_df=None, event_cost_df=None, data_root=None,
+              metrics=('Total Revenue', 'Total Cost', 'Total Profit', 'Net Profit'), chunk_size=100000):
+        """
+        Evaluate every combination of the given variable values with evaluate_schools and return a SensitivityCube.
+        Total Profit leaves the event costs out, as in calculate_financials, while Net Profit is the
+        revenue less the total cost, so it also follows the event frequency.
+        :param baseline: Dict with the value of every SWEEP_VARIABLES column and optionally of
+            'Proportion <n> Parents' columns, used for the variables that are not swept.
+        :param variable_values: Dict of baseline variable name to the values to sweep, in axis order.
+            Swept parent proportions are not renormalised.
+        """
+        unknown = [var for var in variable_values if var not in baseline]
+        if unknown:
+            raise ValueError(f"Unknown sweep variables: {unknown}. Must be among {list(baseline)}.")
+        
+        # Pricing data loaded once for all chunks
+        if treatment_prices_df is None:
+            treatment_prices_df = registry.load('school_outreach_data', 'treatment_prices_new.csv', root=data_root)
+        if event_cost_df is None:
+            event_cost_df = registry.load('school_outreach_data', 'event_cost.csv', root=data_root)
+        
+        def evaluate(grid_values):
+            # One school per grid point, with the baseline for the variables that are not swept
+            n_points = len(next(iter(grid_values.values())))
+            schools_df = pd.DataFrame({var: grid_values.get(var, np.full(n_points, value, dtype=float))
+                                       for var, value in baseline.items()})
+            results_df = cls.evaluate_schools(schools_df, package_list_df, treatment_prices_df, event_cost_df)
+            results_df['Net Profit (Rp.)'] = results_df['Total Revenue (Rp.)'] - results_df['Total Cost (Rp.)']
+            return {metric: results_df[f'{metric} (Rp.)'].to_numpy() for metric in metrics}
+        
+        return sweep_grid(variable_values, evaluate, metrics, chunk_size, baseline)
+    
+    @classmethod
+    def run_sensitivity_analysis(cls, baseline, variables, increments, package_list_df, steps=10, treatment_prices_df=None,
+                                 event_cost_df=None, data_root=None, metric='Net Profit'):
+        # Evaluate the whole profit surface in batches of schools
+        return run_sweep_analysis(
+            lambda value_arrays: cls.sweep(baseline, value_arrays, package_list_df, treatment_prices_df, event_cost_df, data_root),
+            baseline, variables, increments, steps, metric)
 
 
-
-
-
-class ModelAgecareOutreach:
-    def __init__(self, total_population, conversion_rate, discount_price):
+class ModelOutreach:
+    """
+    Outreach program priced per treatment: a share of the population joins the program, each
+    treatment is taken by its own share of the joined customers at a discounted price, and each
+    treatment unit costs the sum of COST_COMPONENTS. Subclasses set the program's data directory
+    and cost components.
+    """
+    # Directory of the program's treatment_prices.csv and event_cost.csv under the data root
+    DATA_DIRECTORY = None
+    
+    # Per-unit cost columns of the treatment prices, summed into each treatment's unit cost
+    COST_COMPONENTS = ['Cost Material (Rp.)', 'Dentist Fee (Rp.)']
+    
+    def __init__(self, total_population, conversion_rate, discount_price, data_root=None):
+        # Data directory, see data_registry.data_root
+        self.data_root = data_root
 
         self.total_population = total_population
         self.conversion_rate = conversion_rate
@@ -439,8 +1265,8 @@ class ModelAgecareOutreach:
         
         
         # Load the treatment prices CSV
-        self.treatment_prices_df = pd.read_csv(r'agecare_outreach_data\treatment_prices.csv')
-        self.event_cost_df = pd.read_csv(r'agecare_outreach_data\event_cost.csv')
+        self.treatment_prices_df = registry.load(self.DATA_DIRECTORY, 'treatment_prices.csv', root=self.data_root)
+        self.event_cost_df = registry.load(self.DATA_DIRECTORY, 'event_cost.csv', root=self.data_root)
 
     
     def initial_price_df(self):
@@ -451,95 +1277,203 @@ class ModelAgecareOutreach:
     
     
     def price_df(self, df):
-        # Adjust prices based on discount price
-        df['Adjusted Price (Rp.)'] = df['Original Price (Rp.)'] * ( 1 -  (df['Discount Price (%)'] / 100))
-        
-        
-        
-        # Create the DataFrame with necessary columns
+        # Create the DataFrame with necessary columns, leaving the caller's DataFrame as is
         price_df = df.copy()
-        price_df['Adjusted Price (Rp.)'] = df['Adjusted Price (Rp.)']
+        
+        # Adjust prices based on discount price
+        price_df['Adjusted Price (Rp.)'] = df['Original Price (Rp.)'] * ( 1 -  (df['Discount Price (%)'] / 100))
         price_df['Demand'] = np.ceil(self.total_joined * (df['Conversion Rate (%)'] / 100))
-        # price_df = price_df[['Treatment', 'Adjusted Price (Rp.)', 'Demand']]
         
         return price_df
     
-    def calculate_financials(self, price_df, total_event_cost, event_frequency):
-        # Calculate total revenue for each treatment
-        price_df['Total Revenue (Rp.)'] = price_df['Adjusted Price (Rp.)'] * price_df['Demand']
+    @classmethod
+    def _unit_cost(cls, treatment_prices_df, cost_overrides=None):
+        """
+        Per-unit cost of each treatment as the sum of COST_COMPONENTS, with shape (..., treatments),
+        looked up in the unit economics of the treatment prices. cost_overrides maps components to
+        values used for every treatment instead of the column, broadcast against the scenario axes.
+        """
+        unit_economics = unit_economics_table('outreach', treatment_prices_df, list(cls.COST_COMPONENTS))
+        if not cost_overrides:
+            return unit_economics['Unit Cost (Rp.)'].to_numpy()
         
-        # Calculate total cost for each treatment (Cost Material + Dentist Fee) * Demand
-        price_df['Total Cost (Rp.)'] = (price_df['Cost Material (Rp.)'] + price_df['Dentist Fee (Rp.)']) * price_df['Demand']
+        unit_cost = 0
+        for component in cls.COST_COMPONENTS:
+            if component in cost_overrides:
+                unit_cost = unit_cost + np.asarray(cost_overrides[component], dtype=float)[..., np.newaxis]
+            else:
+                unit_cost = unit_cost + unit_economics[OUTREACH_COST_COLUMNS[component]].to_numpy()
+        return unit_cost
+    
+    @staticmethod
+    def _treatment_financials(adjusted_price, demand, unit_cost, total_event_cost, event_frequency):
+        """
+        Total revenue, cost (including the event costs) and profit (excluding them) summed over the
+        last (treatment) axis of the broadcast arguments.
+        """
+        revenue = adjusted_price * demand
+        cost = unit_cost * demand
         
-        # Calculate total profit for each treatment (Total Revenue - Total Cost)
-        price_df['Total Profit (Rp.)'] = price_df['Total Revenue (Rp.)'] - price_df['Total Cost (Rp.)']
+        total_revenue = revenue.sum(axis=-1)
+        total_cost = cost.sum(axis=-1) + total_event_cost * event_frequency
+        total_profit = (revenue - cost).sum(axis=-1)
         
-        # Sum total revenue, total cost, and total profit across all treatments
-        total_revenue = price_df['Total Revenue (Rp.)'].sum()
-        total_cost = price_df['Total Cost (Rp.)'].sum() + total_event_cost * event_frequency
-        total_profit = price_df['Total Profit (Rp.)'].sum()
-
-        # Return the overall financials and the price_df with detailed calculations
         return total_revenue, total_cost, total_profit
     
-    def initial_event_cost_df(self):
-        
-        return self.event_cost_df
-    
+    def calculate_financials(self, price_df, total_event_cost, event_frequency):
+        # Reuse the result of an earlier call with the same prices, demand and event costs
+        return result_cache.get_or_compute(
+            (f'{type(self).__name__}.calculate_financials', price_df, total_event_cost, event_frequency),
+            lambda: self._treatment_financials(price_df['Adjusted Price (Rp.)'].to_numpy(dtype=float),
+                                               price_df['Demand'].to_numpy(dtype=float),
+                                               self._unit_cost(price_df), total_event_cost, event_frequency))
     
-class ModelSpecialNeedsOutreach:
-    def __init__(self, total_population, conversion_rate, discount_price):
-
-        self.total_population = total_population
-        self.conversion_rate = conversion_rate
-        self.discount_price = discount_price
-        self.total_joined = self.total_population * (self.conversion_rate / 100)
+    @classmethod
+    def _evaluate_financials(cls, treatment_prices_df, total_event_cost, total_population, conversion_rate, discount_price,
+                             event_frequency, cost_overrides=None):
+        """
+        Total demand, revenue, cost and profit for arrays of scenario values at once. The scenario
+        arguments are broadcast against each other and a treatment axis is added, so every
+        (scenario, treatment) cell is evaluated in one go with the same arithmetic as price_df
+        and calculate_financials. A discount_price of None uses the treatments' own discounts.
+        """
+        total_population, conversion_rate, event_frequency = np.broadcast_arrays(
+            *[np.asarray(value, dtype=float) for value in (total_population, conversion_rate, event_frequency)])
         
+        # Scenario discount for every treatment, or each treatment's own 'Discount Price (%)' when None
+        if discount_price is None:
+            discount_price = treatment_prices_df['Discount Price (%)'].to_numpy(dtype=float)
+        else:
+            discount_price = np.asarray(discount_price, dtype=float)[..., np.newaxis]
         
-        # Load the treatment prices CSV
-        self.treatment_prices_df = pd.read_csv(r'special_needs_outreach_data\treatment_prices.csv')
-        self.event_cost_df = pd.read_csv(r'special_needs_outreach_data\event_cost.csv')
-
-    
-    def initial_price_df(self):
-        df = self.treatment_prices_df.copy()
-        df['Discount Price (%)'] = self.discount_price
-        return df
+        total_joined = total_population * (conversion_rate / 100)
         
+        # (scenarios..., treatments) matrices
+        demand = np.ceil(total_joined[..., np.newaxis] * (treatment_prices_df['Conversion Rate (%)'].to_numpy(dtype=float) / 100))
+        adjusted_price = treatment_prices_df['Original Price (Rp.)'].to_numpy(dtype=float) * (1 - (discount_price / 100))
+        unit_cost = cls._unit_cost(treatment_prices_df, cost_overrides)
+        
+        total_revenue, total_cost, total_profit = cls._treatment_financials(
+            adjusted_price, demand, unit_cost, total_event_cost, event_frequency)
+        
+        return demand.sum(axis=-1), total_revenue, total_cost, total_profit
     
-    
-    def price_df(self, df):
-        # Adjust prices based on discount price
-        df['Adjusted Price (Rp.)'] = df['Original Price (Rp.)'] * ( 1 -  (df['Discount Price (%)'] / 100))
+    @classmethod
+    def evaluate_scenarios(cls, scenarios_df, treatment_prices_df=None, event_cost_df=None, data_root=None):
+        """
+        Demand and financials for many facilities or scenarios at once, with the pricing data loaded once.
+        :param scenarios_df: One row per scenario with 'Total Population', 'Conversion Rate (%)',
+            'Discount Price (%)' and 'Event Frequency' columns.
+        :param data_root: Data directory to load the pricing data from, see data_registry.data_root.
+        :return: scenarios_df with the joined customers, demand and financials of each scenario appended.
+        """
+        if treatment_prices_df is None:
+            treatment_prices_df = registry.load(cls.DATA_DIRECTORY, 'treatment_prices.csv', root=data_root)
+        if event_cost_df is None:
+            event_cost_df = registry.load(cls.DATA_DIRECTORY, 'event_cost.csv', root=data_root)
         
+        total_event_cost = (event_cost_df['Unit'] * event_cost_df['Cost per Unit (Rp.)']).sum()
         
+        total_demand, total_revenue, total_cost, total_profit = cls._evaluate_financials(
+            treatment_prices_df, total_event_cost,
+            scenarios_df['Total Population'].to_numpy(dtype=float),
+            scenarios_df['Conversion Rate (%)'].to_numpy(dtype=float),
+            scenarios_df['Discount Price (%)'].to_numpy(dtype=float),
+            scenarios_df['Event Frequency'].to_numpy(dtype=float))
         
-        # Create the DataFrame with necessary columns
-        price_df = df.copy()
-        price_df['Adjusted Price (Rp.)'] = df['Adjusted Price (Rp.)']
-        price_df['Demand'] = np.ceil(self.total_joined * (df['Conversion Rate (%)'] / 100))
-        # price_df = price_df[['Treatment', 'Adjusted Price (Rp.)', 'Demand']]
+        results_df = scenarios_df.copy()
+        results_df['Total Joined'] = scenarios_df['Total Population'] * (scenarios_df['Conversion Rate (%)'] / 100)
+        results_df['Total Demand'] = total_demand.astype('int64')
+        results_df['Total Revenue (Rp.)'] = total_revenue
+        results_df['Event Cost (Rp.)'] = total_event_cost * scenarios_df['Event Frequency'].to_numpy(dtype=float)
+        results_df['Total Cost (Rp.)'] = total_cost
+        # Profit excludes event costs, as in calculate_financials
+        results_df['Total Profit (Rp.)'] = total_profit
         
-        return price_df
+        return results_df
     
-    def calculate_financials(self, price_df, total_event_cost, event_frequency):
-        # Calculate total revenue for each treatment
-        price_df['Total Revenue (Rp.)'] = price_df['Adjusted Price (Rp.)'] * price_df['Demand']
+    def sweep(self, variable_values, price_df=None, total_event_cost=None, event_frequency=1,
+              metrics=('Total Revenue', 'Total Cost', 'Total Profit', 'Net Profit'), chunk_size=250000):
+        """
+        Evaluate every combination of the given variable values and return a SensitivityCube.
+        Total Profit leaves the event costs out, as in calculate_financials, while Net Profit is the
+        revenue less the total cost, so it also follows the event frequency.
+        :param variable_values: Dict of sweep_variables() name to the values to sweep, in axis order.
+            A swept cost component is used for every treatment.
+        :param price_df: Treatment prices with their 'Discount Price (%)' column, initial_price_df() by default.
+            The discounts are only used when 'Discount Price (%)' is not swept.
+        :param total_event_cost: Cost per event, from event_cost_df by default.
+        :param event_frequency: Number of events when 'Event Frequency' is not swept.
+        """
+        unknown = [var for var in variable_values if var not in self.sweep_variables()]
+        if unknown:
+            raise ValueError(f"Unknown sweep variables: {unknown}. Must be among {self.sweep_variables()}.")
         
-        # Calculate total cost for each treatment (Cost Material + Dentist Fee) * Demand
-        price_df['Total Cost (Rp.)'] = (price_df['Cost Material (Rp.)'] + price_df['Dentist Fee (Rp.)'] + price_df['Sedation Cost (Rp.)']) * price_df['Demand']
+        if price_df is None:
+            price_df = self.initial_price_df()
+        if total_event_cost is None:
+            total_event_cost = (self.event_cost_df['Unit'] * self.event_cost_df['Cost per Unit (Rp.)']).sum()
         
-        # Calculate total profit for each treatment (Total Revenue - Total Cost)
-        price_df['Total Profit (Rp.)'] = price_df['Total Revenue (Rp.)'] - price_df['Total Cost (Rp.)']
+        baseline = self.sweep_baseline(price_df, event_frequency)
         
-        # Sum total revenue, total cost, and total profit across all treatments
-        total_revenue = price_df['Total Revenue (Rp.)'].sum()
-        total_cost = price_df['Total Cost (Rp.)'].sum() + total_event_cost * event_frequency
-        total_profit = price_df['Total Profit (Rp.)'].sum()
-
-        # Return the overall financials and the price_df with detailed calculations
-        return total_revenue, total_cost, total_profit
+        def evaluate(grid_values):
+            _, total_revenue, total_cost, total_profit = self._evaluate_financials(
+                price_df, total_event_cost,
+                grid_values.get("Total Population", self.total_population),
+                grid_values.get("Conversion Rate (%)", self.conversion_rate),
+                grid_values.get("Discount Price (%)"),
+                grid_values.get("Event Frequency", event_frequency),
+                {component: grid_values[component] for component in self.COST_COMPONENTS if component in grid_values})
+            
+            # Broadcast in case no swept variable reaches a metric
+            n_points = len(next(iter(grid_values.values())))
+            evaluated = dict(zip(('Total Revenue', 'Total Cost', 'Total Profit', 'Net Profit'),
+                                 (total_revenue, total_cost, total_profit, total_revenue - total_cost)))
+            return {metric: np.broadcast_to(values, (n_points,)) for metric, values in evaluated.items()}
+        
+        return sweep_grid(variable_values, evaluate, metrics, chunk_size, baseline)
+    
+    @classmethod
+    def sweep_variables(cls):
+        # Scenario drivers followed by the per-unit cost components
+        return ["Total Population", "Conversion Rate (%)", "Discount Price (%)", "Event Frequency"] + cls.COST_COMPONENTS
+    
+    def sweep_baseline(self, price_df, event_frequency):
+        """
+        Current value of each sweep variable. Per-treatment discounts and cost components are
+        represented by their average over the treatments.
+        """
+        baseline = {
+            "Total Population": self.total_population,
+            "Conversion Rate (%)": self.conversion_rate,
+            "Discount Price (%)": price_df['Discount Price (%)'].mean(),
+            "Event Frequency": event_frequency
+        }
+        for component in self.COST_COMPONENTS:
+            baseline[component] = price_df[component].mean()
+        return baseline
+    
+    def run_sensitivity_analysis(self, variables, increments, steps=10, price_df=None, total_event_cost=None, event_frequency=1,
+                                 metric='Net Profit'):
+        if price_df is None:
+            price_df = self.initial_price_df()
+        
+        # Evaluate the whole profit surface as array operations
+        return run_sweep_analysis(
+            lambda value_arrays: self.sweep(value_arrays, price_df, total_event_cost, event_frequency),
+            self.sweep_baseline(price_df, event_frequency), variables, increments, steps, metric)
     
     def initial_event_cost_df(self):
         
-        return self.event_cost_df
\ No newline at end of file
+        return self.event_cost_df
+
+
+class ModelAgecareOutreach(ModelOutreach):
+    DATA_DIRECTORY = 'agecare_outreach_data'
+    
+    
+class ModelSpecialNeedsOutreach(ModelOutreach):
+    DATA_DIRECTORY = 'special_needs_outreach_data'
+    
+    # Special needs treatments are done under sedation
+    COST_COMPONENTS = ModelOutreach.COST_COMPONENTS + ['Sedation Cost (Rp.)']
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+
+from compute_graph import stable_hash
+
+
+class ResultCache:
+    """
+    Bounded cache of model evaluation results keyed by a stable hash of their inputs
+    (scalar parameters and the content of the DataFrames involved). When full, the least
+    recently used result is evicted. Safe to share between threads, i.e. Streamlit sessions.
+    """
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key_parts, compute):
+        """
+        Return the cached result for the inputs in key_parts, or compute() and cache it.
+        """
+        key = stable_hash(*key_parts)
+
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+            self.misses += 1
+
+        # Computed outside the lock so slow evaluations do not block other sessions
+        result = compute()
+
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._results), 'maxsize': self.maxsize}
+
+    def clear(self):
+        with self._lock:
+            self._results = OrderedDict()
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by all models, Streamlit sessions and headless callers in the process
+result_cache = ResultCache()
@@ -0,0 +1,220 @@
+"""
+Run scenarios of the four programs without Streamlit and write the results in bulk.
+
+    python run_scenarios.py scenarios.json results.csv --workers 4
+
+Scenarios are read from a JSON list (or {"scenarios": [...]}), a YAML file of the same shape
+(requires PyYAML) or a CSV with one scenario per row. Each scenario has a 'program' and the
+program's inputs, named like the Streamlit page inputs:
+
+    corporate_wellness:     total_potential_employee, conversion_rate, discount_package,
+                            subscription_length, pricing_basis, treatments (default: all)
+    school_outreach:        total_students, conversion_rate, event_frequency, discount_single,
+                            discount_family, parent_proportions (default: the page's table)
+    agecare_outreach,
+    special_needs_outreach: total_population, conversion_rate, discount_price, event_frequency
+
+In CSV files, list inputs such as treatments and parent_proportions are separated by ';'.
+
+Every results row has the same columns, computed the same way for all programs: 'Total Cost (Rp.)'
+includes 'Event Cost (Rp.)' (0 for corporate wellness, which has no events) and
+'Net Profit (Rp.)' is 'Total Revenue (Rp.)' - 'Total Cost (Rp.)'. Note that the outreach pages'
+'Total Profit' excludes event costs, so it is the net profit plus the event cost.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_registry import registry
+from model import ModelCorporateWellness, ModelSchoolOutreach, ModelAgecareOutreach, ModelSpecialNeedsOutreach
+
+PROGRAMS = ['corporate_wellness', 'school_outreach', 'agecare_outreach', 'special_needs_outreach']
+
+LIST_INPUTS = ['treatments', 'parent_proportions']
+
+
+def load_scenarios(path):
+    """
+    Read the list of scenario dicts from a JSON, YAML or CSV file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.csv':
+        scenarios = []
+        for row in pd.read_csv(path).to_dict(orient='records'):
+            scenario = {key: value for key, value in row.items() if not (isinstance(value, float) and np.isnan(value))}
+            for key in LIST_INPUTS:
+                if isinstance(scenario.get(key), str):
+                    scenario[key] = [item.strip() for item in scenario[key].split(';') if item.strip()]
+            scenarios.append(scenario)
+        return scenarios
+
+    with open(path) as file:
+        if extension in ('.yaml', '.yml'):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML scenarios requires PyYAML (pip install pyyaml).") from None
+            content = yaml.safe_load(file)
+        elif extension == '.json':
+            content = json.load(file)
+        else:
+            raise ValueError(f"Unsupported scenario file type '{extension}'. Must be .json, .yaml, .yml or .csv.")
+
+    if isinstance(content, dict):
+        content = content['scenarios']
+    return content
+
+
+def _run_corporate_wellness(scenario, data_root):
+    model = ModelCorporateWellness(data_root=data_root)
+    model.set_pricing_basis(scenario.get('pricing_basis', 'Dr.Riesqi'))
+
+    model.set_parameters(total_potential_employee=scenario['total_potential_employee'],
+                         conversion_rate=scenario['conversion_rate'],
+                         treatments=scenario.get('treatments') or model.prices_df['Treatment'].tolist(),
+                         discount_package=scenario['discount_package'],
+                         subscription_length=scenario['subscription_length'])
+
+    aro = model.calculate_ARO()
+    total_cost = model.calculate_total_cost()
+
+    # All DSP treatments are selected, as by default on the page
+    dsp_df = model.dsp_df
+    dsp_df['Selected'] = True
+    dsp_aro, dsp_cost, _ = model.calculate_DSP(dsp_df, model.total_joining_employee)
+
+    return {'Total Joining': model.total_joining_employee,
+            'Total Revenue (Rp.)': aro + dsp_aro,
+            'Total Cost (Rp.)': total_cost + dsp_cost,
+            'Event Cost (Rp.)': 0}
+
+
+def _run_outreach(model_class, scenarios, data_root):
+    # All scenarios of the program are evaluated together as one table of facilities
+    scenarios_df = pd.DataFrame({
+        'Total Population': [scenario['total_population'] for scenario in scenarios],
+        'Conversion Rate (%)': [scenario['conversion_rate'] for scenario in scenarios],
+        'Discount Price (%)': [scenario['discount_price'] for scenario in scenarios],
+        'Event Frequency': [scenario['event_frequency'] for scenario in scenarios]
+    })
+    
+    results_df = model_class.evaluate_scenarios(scenarios_df, data_root=data_root)
+
+    return [{'Total Joining': row['Total Joined'],
+             'Total Revenue (Rp.)': row['Total Revenue (Rp.)'],
+             'Total Cost (Rp.)': row['Total Cost (Rp.)'],
+             'Event Cost (Rp.)': row['Event Cost (Rp.)']} for _, row in results_df.iterrows()]
+
+
+def _run_school_outreach(scenarios, data_root):
+    # All school scenarios are evaluated together as one table of schools
+    schools_df = pd.DataFrame({
+        'Total Students': [scenario['total_students'] for scenario in scenarios],
+        'Conversion Rate (%)': [scenario['conversion_rate'] for scenario in scenarios],
+        'Event Frequency': [scenario['event_frequency'] for scenario in scenarios],
+        'Discount Single (%)': [scenario['discount_single'] for scenario in scenarios],
+        'Discount Family (%)': [scenario['discount_family'] for scenario in scenarios]
+    })
+
+    default_proportions = list(ModelSchoolOutreach.DEFAULT_PARENT_PROPORTIONS.values())
+    proportions = [scenario.get('parent_proportions') or default_proportions for scenario in scenarios]
+    width = max(len(row) for row in proportions)
+    for parents in range(width):
+        schools_df[f'Proportion {parents} Parents'] = [float(row[parents]) if parents < len(row) else 0.0 for row in proportions]
+
+    package_list_df = registry.load('school_outreach_data', 'package_list.csv', root=data_root)
+    results_df = ModelSchoolOutreach.evaluate_schools(schools_df, package_list_df, data_root=data_root)
+
+    return [{'Total Joining': row['Converting Students'] + row['Converting Parents'],
+             'Total Revenue (Rp.)': row['Total Revenue (Rp.)'],
+             'Total Cost (Rp.)': row['Total Cost (Rp.)'],
+             'Event Cost (Rp.)': row['Event Cost (Rp.)']} for _, row in results_df.iterrows()]
+
+
+def _run_chunk(scenarios, data_root=None):
+    """
+    Results of a list of scenarios, in order. Module-level so it can be sent to a process pool.
+    """
+    results = [None] * len(scenarios)
+
+    unknown = {scenario.get('program') for scenario in scenarios} - set(PROGRAMS)
+    if unknown:
+        raise ValueError(f"Unknown programs {sorted(map(str, unknown))}. Must be among {PROGRAMS}.")
+
+    # Outreach programs are evaluated in one batch per program, corporate wellness scenario by scenario
+    batched_programs = {'school_outreach': _run_school_outreach,
+                        'agecare_outreach': lambda batch, root: _run_outreach(ModelAgecareOutreach, batch, root),
+                        'special_needs_outreach': lambda batch, root: _run_outreach(ModelSpecialNeedsOutreach, batch, root)}
+    
+    for program, run_batch in batched_programs.items():
+        positions = [i for i, scenario in enumerate(scenarios) if scenario['program'] == program]
+        if positions:
+            for i, result in zip(positions, run_batch([scenarios[i] for i in positions], data_root)):
+                results[i] = result
+
+    for i, scenario in enumerate(scenarios):
+        if scenario['program'] == 'corporate_wellness':
+            results[i] = _run_corporate_wellness(scenario, data_root)
+
+    # Net profit of every program after all costs, event costs included
+    for result in results:
+        result['Net Profit (Rp.)'] = result['Total Revenue (Rp.)'] - result['Total Cost (Rp.)']
+
+    return [dict({'Scenario': scenario.get('name', position), 'Program': scenario['program']}, **result)
+            for position, (scenario, result) in enumerate(zip(scenarios, results))]
+
+
+def run_scenarios(scenarios, workers=1, chunk_size=500, data_root=None):
+    """
+    Run every scenario and return one results row per scenario, in input order.
+    With workers > 1, chunks of chunk_size scenarios are spread over worker processes.
+    """
+    # Unnamed scenarios are labelled by their position in the whole input
+    scenarios = [dict(scenario, name=scenario.get('name', i)) for i, scenario in enumerate(scenarios)]
+    chunks = [scenarios[start:start + chunk_size] for start in range(0, len(scenarios), chunk_size)]
+
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(_run_chunk, chunks, [data_root] * len(chunks)))
+    else:
+        chunk_results = [_run_chunk(chunk, data_root) for chunk in chunks]
+
+    return pd.DataFrame([row for rows in chunk_results for row in rows])
+
+
+def write_results(results_df, path):
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == '.json':
+        results_df.to_json(path, orient='records', indent=2)
+    elif extension == '.csv':
+        results_df.to_csv(path, index=False)
+    else:
+        raise ValueError(f"Unsupported output file type '{extension}'. Must be .csv or .json.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run program scenarios without the Streamlit UI.",
+                                     epilog="'Total Cost (Rp.)' includes 'Event Cost (Rp.)' and 'Net Profit (Rp.)' is "
+                                            "revenue minus total cost, for every program.")
+    parser.add_argument('scenarios', help="Scenario file (.json, .yaml, .yml or .csv)")
+    parser.add_argument('output', help="Results file (.csv or .json)")
+    parser.add_argument('--workers', type=int, default=1, help="Number of worker processes (default: 1)")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Scenarios per worker task (default: 500)")
+    parser.add_argument('--data-root', default=None, help="Data directory, see data_registry.data_root")
+    args = parser.parse_args(argv)
+
+    results_df = run_scenarios(load_scenarios(args.scenarios), workers=args.workers,
+                               chunk_size=args.chunk_size, data_root=args.data_root)
+    write_results(results_df, args.output)
+
+    print(f"Wrote {len(results_df)} scenario results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
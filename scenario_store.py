@@ -0,0 +1,232 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+
+# Milliseconds a writer waits for another session's write to finish before giving up
+BUSY_TIMEOUT_MS = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    avg_revenue REAL NOT NULL,
+    avg_expense REAL NOT NULL,
+    avg_profit REAL NOT NULL,
+    inputs TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS scenarios_avg_profit ON scenarios (avg_profit);
+CREATE INDEX IF NOT EXISTS scenarios_created_at ON scenarios (created_at);
+
+CREATE TABLE IF NOT EXISTS scenario_cashflows (
+    scenario_id INTEGER NOT NULL REFERENCES scenarios (id) ON DELETE CASCADE,
+    period INTEGER NOT NULL,
+    revenue REAL NOT NULL,
+    expense REAL NOT NULL,
+    PRIMARY KEY (scenario_id, period)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+METRIC_COLUMNS = {'avg_revenue': 'Avg Total Revenue', 'avg_expense': 'Avg Total Expense', 'avg_profit': 'Avg Profit'}
+
+
+class ScenarioStore:
+    """
+    Saved cashflow scenarios in a SQLite database. Every save appends one scenario row, holding
+    its averages and full inputs as JSON, plus one row per period of its cashflow; nothing else
+    is rewritten. Ids are never reused, even after deletions. The database runs in WAL mode so
+    several Streamlit sessions can read while one of them writes, and writers wait for each other.
+    """
+    def __init__(self, path='scenarios.db', legacy_csv_path=None):
+        """
+        :param path: Path of the SQLite database, created if missing.
+        :param legacy_csv_path: Optional scenario_metrics.csv written by earlier versions of the
+                                cashflow page, imported the first time the store is opened.
+        """
+        self.path = path
+
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+
+        if legacy_csv_path is not None:
+            self.migrate_legacy_csv(legacy_csv_path)
+
+    def _connect(self):
+        # One short-lived connection per operation, as Streamlit runs sessions in separate threads
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000)
+        connection.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        connection.execute("PRAGMA foreign_keys=ON")
+        return _closing(connection)
+
+    def save(self, avg_revenue, avg_expense, cashflow_df=None, inputs=None, name=None):
+        """
+        Append a scenario and return its id.
+        :param avg_revenue: Average revenue per period.
+        :param avg_expense: Average expense per period.
+        :param cashflow_df: Optional per-period cashflow with Period and Revenue/Expense
+                            (or Total Revenue/Total Expense) columns.
+        :param inputs: JSON-serialisable dict of the inputs the scenario was computed from.
+        :param name: Display name, 'Scenario <id>' by default.
+        """
+        with self._connect() as connection:
+            return self._insert(connection, avg_revenue, avg_expense, cashflow_df, inputs, name)
+
+    @staticmethod
+    def _insert(connection, avg_revenue, avg_expense, cashflow_df, inputs, name):
+        created_at = datetime.now(timezone.utc).isoformat()
+        inputs_json = json.dumps(inputs or {}, sort_keys=True, default=str)
+
+        cursor = connection.execute(
+            "INSERT INTO scenarios (name, created_at, avg_revenue, avg_expense, avg_profit, inputs) VALUES (?, ?, ?, ?, ?, ?)",
+            (name or '', created_at, float(avg_revenue), float(avg_expense), float(avg_revenue - avg_expense), inputs_json))
+        scenario_id = cursor.lastrowid
+
+        if not name:
+            connection.execute("UPDATE scenarios SET name = ? WHERE id = ?", (f'Scenario {scenario_id}', scenario_id))
+
+        if cashflow_df is not None:
+            revenue_column = 'Total Revenue' if 'Total Revenue' in cashflow_df.columns else 'Revenue'
+            expense_column = 'Total Expense' if 'Total Expense' in cashflow_df.columns else 'Expense'
+            rows = zip([scenario_id] * len(cashflow_df),
+                       cashflow_df['Period'].astype(int).tolist(),
+                       cashflow_df[revenue_column].fillna(0).astype(float).tolist(),
+                       cashflow_df[expense_column].fillna(0).astype(float).tolist())
+            connection.executemany(
+                "INSERT INTO scenario_cashflows (scenario_id, period, revenue, expense) VALUES (?, ?, ?, ?)", rows)
+
+        return scenario_id
+
+    def get(self, scenario_id):
+        """
+        The saved scenario as a dict with its inputs decoded, or None if there is no such id.
+        """
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT id, name, created_at, avg_revenue, avg_expense, avg_profit, inputs FROM scenarios WHERE id = ?",
+                (scenario_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        keys = ['id', 'name', 'created_at', 'avg_revenue', 'avg_expense', 'avg_profit', 'inputs']
+        scenario = dict(zip(keys, row))
+        scenario['inputs'] = json.loads(scenario['inputs'])
+        return scenario
+
+    def cashflow(self, scenario_id):
+        """
+        Per-period cashflow of a scenario with Period, Revenue and Expense columns.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT period, revenue, expense FROM scenario_cashflows WHERE scenario_id = ? ORDER BY period",
+                (scenario_id,)).fetchall()
+
+        return pd.DataFrame(rows, columns=['Period', 'Revenue', 'Expense'])
+
+    def metrics(self, scenario_ids=None, order_by_profit=False, limit=None):
+        """
+        Averages of the given scenarios (all by default), indexed by scenario id.
+        :param order_by_profit: Order by average profit, highest first, instead of by id.
+        :param limit: Maximum number of scenarios returned.
+        """
+        query = "SELECT id, name, avg_revenue, avg_expense, avg_profit FROM scenarios"
+        parameters = []
+
+        if scenario_ids is not None:
+            scenario_ids = [int(scenario_id) for scenario_id in scenario_ids]
+            query += f" WHERE id IN ({', '.join('?' * len(scenario_ids))})"
+            parameters += scenario_ids
+
+        query += " ORDER BY avg_profit DESC, id" if order_by_profit else " ORDER BY id"
+
+        if limit is not None:
+            query += " LIMIT ?"
+            parameters.append(int(limit))
+
+        with self._connect() as connection:
+            rows = connection.execute(query, parameters).fetchall()
+
+        df = pd.DataFrame(rows, columns=['Scenario', 'Name'] + list(METRIC_COLUMNS.values()))
+        return df.set_index('Scenario')
+
+    def metrics_dict(self, scenario_ids=None):
+        """
+        {scenario id: [average revenue, average expense]}, the shape taken by
+        ModelCashflow.create_profit_comparison_matrix.
+        """
+        df = self.metrics(scenario_ids)
+        return {scenario_id: [avg_revenue, avg_expense] for scenario_id, avg_revenue, avg_expense
+                in zip(df.index, df['Avg Total Revenue'], df['Avg Total Expense'])}
+
+    def count(self):
+        with self._connect() as connection:
+            return connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def delete(self, scenario_id):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM scenarios WHERE id = ?", (scenario_id,))
+
+    def clear(self):
+        """
+        Delete every scenario. Ids keep counting up from the last one saved.
+        """
+        with self._connect() as connection:
+            connection.execute("DELETE FROM scenarios")
+
+    def migrate_legacy_csv(self, csv_path):
+        """
+        Import the scenarios of a legacy scenario_metrics.csv (Scenario, Avg Total Revenue and
+        Avg Total Expense columns) once, keeping their order. The CSV file is left in place.
+        Returns the number of imported scenarios.
+        """
+        if not os.path.exists(csv_path):
+            return 0
+
+        legacy_df = pd.read_csv(csv_path)
+
+        with self._connect() as connection:
+            # Taking the write lock first makes sure concurrent sessions import the file only once
+            connection.execute("BEGIN IMMEDIATE")
+            migrated = connection.execute("SELECT value FROM store_meta WHERE key = 'legacy_csv_migrated'").fetchone()
+            if migrated is not None:
+                return 0
+
+            for _, row in legacy_df.iterrows():
+                self._insert(connection, row['Avg Total Revenue'], row['Avg Total Expense'], None,
+                             {'legacy_scenario': int(row['Scenario']), 'source': os.path.basename(csv_path)}, None)
+
+            connection.execute("INSERT INTO store_meta (key, value) VALUES ('legacy_csv_migrated', ?)",
+                               (os.path.abspath(csv_path),))
+
+        return len(legacy_df)
+
+
+class _closing:
+    """
+    Context manager committing (or rolling back) the connection's transaction and closing it.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.connection.close()
+        return False
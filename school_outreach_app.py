@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 from model import *  # Importing the Model class from model.py
+from data_registry import output_path, registry
 import numpy as np
 
 def app():
@@ -73,7 +74,7 @@ def app():
     )
     
     
-    package_list_df = pd.read_csv(r'school_outreach_data/package_list.csv')
+    package_list_df = registry.load('school_outreach_data', 'package_list.csv')
 
     # Define all possible treatments for the multiselect options
     all_treatments = [
@@ -154,7 +155,7 @@ def app():
     price_df = model.price_df(edited_prices)
     st.dataframe(price_df, hide_index=True)
     
-    price_df.to_csv('price_df.csv', index=False)
+    price_df.to_csv(output_path('price_df.csv'), index=False)
     
     if st.button("Calculate"):
         
@@ -172,10 +173,51 @@ def app():
         with col2:
             st.metric("Total Profit", f"Rp.{total_profit:,.0f}")
             
+        with st.expander("Financials per Package", expanded=False):
+            st.dataframe(model.package_financials, hide_index=True)
         
-        cashflow_df = GeneralModel().create_cashflow_df(total_revenue, total_cost, 1, 12, period_type='monthly')
+        cashflow_df = GeneralModel().program_cashflow_df('school_outreach', total_revenue, total_cost, 1, 12, period_type='monthly')
         # st.dataframe(cashflow_df, hide_index=True)
         # st.write(f'Average Revenue: Rp.{cashflow_df["Revenue"].mean():,.0f}')
         # st.write(f'Total Revenue: Rp.{cashflow_df["Revenue"].sum():,.0f}')
         
-        cashflow_df.to_csv('school_cashflow.csv', index=False)
\ No newline at end of file
+        cashflow_df.to_csv(output_path('school_cashflow.csv'), index=False)        
+    st.divider()
+    
+    st.markdown('#### Sensitivity Analysis')
+    
+    # Current parameters as one school, with the parent proportions of the table above
+    sweep_baseline = {
+        'Total Students': total_students,
+        'Conversion Rate (%)': conversion_rate,
+        'Event Frequency': event_frequency,
+        'Discount Single (%)': discount_price_single,
+        'Discount Family (%)': discount_price_family
+    }
+    for parents, proportion in zip(converting_parents_df['Number of Converting Parents'], converting_parents_df['Proportion (%)']):
+        sweep_baseline[f'Proportion {parents} Parents'] = proportion
+    sweep_variables = list(sweep_baseline)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+    
+        var_one = st.selectbox("Select Variable 1", sweep_variables, index=1)
+        
+        # Proportions are fractions, so they take a fractional increment
+        var_one_increment = st.number_input("Set Increment for Var 1", value=0.05 if var_one.startswith('Proportion') else 10.0, step=1.0)
+        
+    with col2:
+        var_two = st.selectbox("Select Variable 2", sweep_variables, index=4)
+        
+        var_two_increment = st.number_input("Set Increment for Var 2", value=0.05 if var_two.startswith('Proportion') else 10.0, step=1.0)
+        
+    st.caption('The heatmap shows the net profit, i.e. after event costs. Discounts are applied to every treatment, and swept parent proportions are not rebalanced against the others')
+    
+    fig_sensitivity_analysis, sensitivity_analysis_df = ModelSchoolOutreach.run_sensitivity_analysis(
+        sweep_baseline, [var_one, var_two], [var_one_increment, var_two_increment], edited_package_list_df,
+        treatment_prices_df=edited_prices, event_cost_df=edited_event_cost, metric='Net Profit')
+    
+    st.dataframe(sensitivity_analysis_df, hide_index=True, use_container_width=True)
+    
+    st.plotly_chart(fig_sensitivity_analysis)
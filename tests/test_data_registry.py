@@ -0,0 +1,85 @@
+"""
+Data and output locations of data_registry, and its binary caches. Run with `python -m pytest -q`
+from the package directory.
+"""
+import hashlib
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from data_registry import (OUTPUT_ROOT_ENV, PACKAGE_ROOT, SCHEMAS, DataRegistry, cache_path, data_path, ingest,
+                           normalise_dataframe, output_path, read_cache, result_input_path)
+
+
+def test_outputs_follow_the_output_root(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_root = tmp_path / 'results'
+    monkeypatch.setenv(OUTPUT_ROOT_ENV, str(output_root))
+
+    assert output_path('scenarios.db') == str(output_root / 'scenarios.db')
+    assert output_root.is_dir()
+
+    # Results read back come from the package until a page writes them to the output root
+    assert result_input_path('corporate_cashflow.csv') == os.path.join(PACKAGE_ROOT, 'corporate_cashflow.csv')
+    (output_root / 'corporate_cashflow.csv').write_text('Period,Revenue,Expense\n')
+    assert result_input_path('corporate_cashflow.csv') == str(output_root / 'corporate_cashflow.csv')
+
+
+def test_outputs_default_to_the_package_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(OUTPUT_ROOT_ENV, raising=False)
+
+    assert output_path('price_df.csv') == os.path.join(PACKAGE_ROOT, 'price_df.csv')
+    assert os.path.exists(result_input_path('school_cashflow.csv'))
+
+
+@pytest.fixture
+def data_copy(tmp_path):
+    # A writable copy of the bundled data, with its binary caches
+    for directory in {path_parts[0] for path_parts in SCHEMAS}:
+        shutil.copytree(os.path.join(PACKAGE_ROOT, directory), tmp_path / directory,
+                        ignore=shutil.ignore_patterns('*.npz'))
+    ingest(str(tmp_path))
+    return tmp_path
+
+
+def test_cache_round_trips_every_data_file(data_copy):
+    for path_parts, schema in SCHEMAS.items():
+        path = data_path(*path_parts, root=str(data_copy))
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as file:
+            content = file.read()
+
+        parsed = normalise_dataframe(pd.read_csv(path), schema, path)
+        cached = read_cache(cache_path(path), hashlib.sha1(content).hexdigest())
+
+        pd.testing.assert_frame_equal(cached, parsed, check_dtype=False)
+        for column in parsed.columns:
+            assert pd.api.types.is_numeric_dtype(cached[column]) == pd.api.types.is_numeric_dtype(parsed[column])
+
+
+def test_changed_source_invalidates_cache(data_copy):
+    registry = DataRegistry()
+    path_parts = ('corporate_wellness_data', 'treatment_prices.csv')
+    path = data_path(*path_parts, root=str(data_copy))
+    original = registry.load(*path_parts, root=str(data_copy))
+
+    # A new price in the source file is picked up although its cache is now stale
+    edited = pd.read_csv(path)
+    edited.loc[0, 'Price (Rp.)'] = 123456
+    edited.to_csv(path, index=False)
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+
+    with open(path, 'rb') as file:
+        assert read_cache(cache_path(path), hashlib.sha1(file.read()).hexdigest()) is None
+    reloaded = registry.load(*path_parts, root=str(data_copy))
+    assert reloaded.loc[0, 'Price (Rp.)'] == 123456
+    assert reloaded.loc[1:].equals(original.loc[1:])
+
+    # Without the source file, the cache of the last ingest is used
+    ingest(str(data_copy))
+    os.remove(path)
+    assert DataRegistry().load(*path_parts, root=str(data_copy)).loc[0, 'Price (Rp.)'] == 123456
@@ -0,0 +1,233 @@
+"""
+Parity of the vectorized models with the original per-row formulas, which are kept here as
+reference implementations. Run with `python -m pytest -q` from the package directory.
+"""
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_registry import registry
+from model import ModelAgecareOutreach, ModelCorporateWellness, ModelSchoolOutreach, ModelSpecialNeedsOutreach
+
+PRICING_BASES = ['Dr.Riesqi', 'GAIA Indonesia']
+
+
+def reference_ARO(prices_df, treatments, total_joining_employee, discount_package, subscription_length):
+    total_price = prices_df[prices_df['Treatment'].isin(treatments)]['Price (Rp.)'].sum()
+    return total_price * total_joining_employee * (100 - discount_package) / 100 * (subscription_length * 12)
+
+
+def reference_total_cost(costs_df, treatments, total_joining_employee, subscription_length):
+    costs_df = costs_df.copy()
+    material_cost = costs_df[costs_df['Component'].isin(treatments)]['Material Cost (Rp.)'].sum()
+    costs_df['Dentist Fee Total (Rp.)'] = costs_df['Dentist Fee per Hour (Rp.)'] * (costs_df['Duration (Min)'] / 60)
+    dentist_fee_total = costs_df[costs_df['Component'].isin(treatments)]['Dentist Fee Total (Rp.)'].sum()
+    card_fee = costs_df[costs_df['Component'] == 'Member Card (monthly)']['Material Cost (Rp.)'].values[0]
+    return (material_cost + dentist_fee_total + card_fee) * total_joining_employee * (subscription_length * 12)
+
+
+def reference_DSP(dsp_editor_df, total_joining_employee):
+    dsp_selected = dsp_editor_df[dsp_editor_df['Selected'] == True]
+    total_dsp_aro = 0
+    total_dsp_cost = 0
+    rows = []
+    for _, row in dsp_selected.iterrows():
+        original_row = dsp_selected[dsp_selected['Treatment'] == row['Treatment']].iloc[0]
+        dsp_price = original_row['Original Price (Rp.)'] * (1 - row['Discount Price (%)'] / 100)
+        dsp_dentist_fee = original_row['Dentist Fee Per Hour (Rp.)'] * (original_row['Duration (Min)'] / 60)
+        dsp_total_joining = np.ceil(total_joining_employee * row['Conversion Rate (%)'] / 100)
+        dsp_aro = dsp_price * dsp_total_joining
+        dsp_cost = (original_row['Cost Material (Rp.)'] + dsp_dentist_fee) * dsp_total_joining
+        total_dsp_aro += dsp_aro
+        total_dsp_cost += dsp_cost
+        rows.append((row['Treatment'], int(dsp_total_joining), int(dsp_aro), int(dsp_cost)))
+    return total_dsp_aro, total_dsp_cost, rows
+
+
+def reference_school_financials(price_df, package_demand_df, total_event_cost, event_frequency):
+    total_revenue = total_cost = total_profit = 0
+    for _, package_row in package_demand_df.iterrows():
+        for treatment in package_row['Description'].split(', '):
+            treatment_row = price_df[(price_df['Treatment'] == treatment) & (price_df['Category'] == package_row['Category'])]
+            if treatment_row.empty:
+                continue
+            unit_cost = treatment_row['Cost Material (Rp.)'].values[0] + treatment_row['Dentist Fee (Rp.)'].values[0]
+            revenue = (treatment_row['Adjusted Price Single (Rp.)'].values[0] * package_row['Demand with Single Discount']
+                       + treatment_row['Adjusted Price Family (Rp.)'].values[0] * package_row['Demand with Family Discount'])
+            cost = unit_cost * (package_row['Demand with Single Discount'] + package_row['Demand with Family Discount'])
+            total_revenue += revenue
+            total_cost += cost
+            total_profit += revenue - cost
+    return total_revenue, total_cost + total_event_cost * event_frequency, total_profit
+
+
+def reference_outreach_financials(price_df, cost_columns, total_event_cost, event_frequency):
+    revenue = price_df['Adjusted Price (Rp.)'] * price_df['Demand']
+    cost = price_df[cost_columns].sum(axis=1) * price_df['Demand']
+    return revenue.sum(), cost.sum() + total_event_cost * event_frequency, (revenue - cost).sum()
+
+
+def corporate_model(pricing_basis, treatments=None, total_potential_employee=466, conversion_rate=20,
+                    discount_package=20, subscription_length=1):
+    model = ModelCorporateWellness()
+    model.set_pricing_basis(pricing_basis)
+    model.dsp_df = model.dsp_df.assign(Selected=True)
+    if treatments is None:
+        treatments = model.prices_df['Treatment'].tolist()
+    model.set_parameters(total_potential_employee, conversion_rate, treatments, discount_package, subscription_length)
+    return model
+
+
+def with_duplicate_rows(model):
+    # A second price row for a treatment, and second cost and member card rows, as editable tables allow
+    model.prices_df = pd.concat([model.prices_df, model.prices_df.iloc[[0]].assign(**{'Price (Rp.)': 12345})],
+                                ignore_index=True)
+    card = model.costs_df[model.costs_df['Component'] == 'Member Card (monthly)']
+    model.costs_df = pd.concat([model.costs_df, model.costs_df.iloc[[0]].assign(**{'Material Cost (Rp.)': 777}),
+                                card.assign(**{'Material Cost (Rp.)': 99999})], ignore_index=True)
+    return model
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+@pytest.mark.parametrize('duplicates', [False, True])
+def test_corporate_package_matches_reference(pricing_basis, duplicates):
+    model = corporate_model(pricing_basis)
+    if duplicates:
+        model = with_duplicate_rows(model)
+    treatment_list = model.prices_df['Treatment'].drop_duplicates().tolist()
+
+    for n_treatments in range(len(treatment_list) + 1):
+        for treatments in itertools.combinations(treatment_list, n_treatments):
+            model.set_parameters(466, 20, list(treatments), 15, 2)
+            costs_df = model.costs_df.copy()
+
+            assert model.calculate_ARO() == pytest.approx(
+                reference_ARO(model.prices_df, treatments, model.total_joining_employee, 15, 2), rel=1e-12)
+            assert model.calculate_total_cost() == pytest.approx(
+                reference_total_cost(costs_df, treatments, model.total_joining_employee, 2), rel=1e-12)
+
+            # The costs table is left as it was
+            pd.testing.assert_frame_equal(model.costs_df, costs_df)
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+def test_DSP_matches_reference_with_deselected_and_duplicate_rows(pricing_basis):
+    model = corporate_model(pricing_basis)
+
+    # Deselect the first treatment and add a selected duplicate of it at another price and conversion rate
+    dsp_editor_df = model.dsp_df.copy()
+    dsp_editor_df.loc[0, 'Selected'] = False
+    duplicate = dsp_editor_df.iloc[[0]].assign(**{'Selected': True, 'Original Price (Rp.)': 9999999, 'Conversion Rate (%)': 7.0})
+    dsp_editor_df = pd.concat([dsp_editor_df, duplicate, duplicate.assign(**{'Original Price (Rp.)': 1})], ignore_index=True)
+
+    for total_joining_employee in [0, 1, 94, 466]:
+        total_dsp_aro, total_dsp_cost, dsp_df_output = model.calculate_DSP(dsp_editor_df, total_joining_employee)
+        reference_aro, reference_cost, reference_rows = reference_DSP(dsp_editor_df, total_joining_employee)
+
+        assert total_dsp_aro == pytest.approx(reference_aro, rel=1e-12)
+        assert total_dsp_cost == pytest.approx(reference_cost, rel=1e-12)
+        assert list(dsp_df_output.itertuples(index=False, name=None)) == reference_rows
+
+
+def test_school_financials_match_reference():
+    package_list_df = registry.load('school_outreach_data', 'package_list.csv')
+    model = ModelSchoolOutreach(150, 100, 45, 10, 20)
+    package_demand_df = model.calculate_package_demand(package_list_df)
+
+    # A duplicate (Treatment, Category) row, of which only the first is used
+    edited_prices = model.initial_price_df()
+    edited_prices = pd.concat([edited_prices, edited_prices.iloc[[0]].assign(**{'Original Price (Rp.)': 1})], ignore_index=True)
+    edited_prices.loc[1, 'Discount Single (%)'] = 35
+    price_df = model.price_df(edited_prices)
+
+    financials = model.calculate_financials(price_df, package_demand_df, 2500000, 4)
+
+    np.testing.assert_allclose(financials, reference_school_financials(price_df, package_demand_df, 2500000, 4), rtol=1e-12)
+
+
+@pytest.mark.parametrize('model_class, cost_columns', [
+    (ModelAgecareOutreach, ['Cost Material (Rp.)', 'Dentist Fee (Rp.)']),
+    (ModelSpecialNeedsOutreach, ['Cost Material (Rp.)', 'Dentist Fee (Rp.)', 'Sedation Cost (Rp.)'])
+])
+def test_outreach_financials_match_reference(model_class, cost_columns):
+    model = model_class(1234, 17, 10)
+
+    edited_prices = model.initial_price_df()
+    edited_prices.loc[0, 'Discount Price (%)'] = 45
+    edited_prices.loc[1, 'Cost Material (Rp.)'] = 31337
+    price_df = model.price_df(edited_prices)
+
+    financials = model.calculate_financials(price_df, 1500000, 3)
+
+    np.testing.assert_allclose(financials, reference_outreach_financials(price_df, cost_columns, 1500000, 3), rtol=1e-12)
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+def test_rank_bundles_matches_brute_force(pricing_basis):
+    model = with_duplicate_rows(corporate_model(pricing_basis))
+    treatment_list = model.prices_df['Treatment'].drop_duplicates().tolist()
+
+    # Monthly profit per employee of every non-empty package, through calculate_ARO and calculate_total_cost
+    bundles = []
+    for n_treatments in range(1, len(treatment_list) + 1):
+        for treatments in itertools.combinations(treatment_list, n_treatments):
+            model.set_parameters(1, 100, list(treatments), 20, 1)
+            price = model.calculate_ARO() / 12
+            bundles.append((price, price - model.calculate_total_cost() / 12))
+
+    for top_k, min_price, max_price in [(len(bundles), None, None), (3, None, None), (5, 300000, 800000)]:
+        kept = [profit for price, profit in bundles
+                if (min_price is None or price >= min_price) and (max_price is None or price <= max_price)]
+        expected = sorted(kept, reverse=True)[:top_k]
+
+        ranked = model.rank_bundles(treatment_list, top_k=top_k, min_price=min_price, max_price=max_price, discount_package=20)
+
+        np.testing.assert_allclose(ranked['Profit per Employee (Rp.)'], expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+@pytest.mark.parametrize('treatments, discount_package, subscription_length', [
+    (['Simple Filling'], 84, 1), (['Simple Filling'], 84, 2), (['Simple Filling'], 60, 1), (None, 20, 1), (None, 100, 1)
+])
+@pytest.mark.parametrize('fixed_cost', [0, 5000000, 50000000])
+def test_break_even_matches_brute_force(pricing_basis, treatments, discount_package, subscription_length, fixed_cost):
+    model = corporate_model(pricing_basis, treatments, discount_package=discount_package,
+                            subscription_length=subscription_length)
+    min_joining, _ = model.break_even(fixed_cost)
+    
+    # Profit of every joining count up to a bound well past the answers, with everyone converting
+    joining = np.arange(1, 20001)
+    _, _, total_profit = model._evaluate_financials(conversion_rate=100, total_potential_employee=joining)
+    reached = np.flatnonzero(total_profit >= fixed_cost)
+    
+    assert min_joining == (int(joining[reached[0]]) if len(reached) else None)
+    
+    if min_joining is not None:
+        # The profit at the break-even count, through the original formulas
+        aro = reference_ARO(model.prices_df, model.treatments, min_joining, discount_package, subscription_length)
+        cost = reference_total_cost(model.costs_df, model.treatments, min_joining, subscription_length)
+        dsp_aro, dsp_cost, _ = reference_DSP(model.dsp_df, min_joining)
+        assert aro + dsp_aro - cost - dsp_cost >= fixed_cost - 1
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+def test_optimize_ignores_repeated_candidates(pricing_basis):
+    model = corporate_model(pricing_basis)
+    treatment_list = model.prices_df['Treatment'].drop_duplicates().tolist()
+    
+    optimized = model.optimize(treatment_list)
+    repeated = model.optimize(treatment_list + treatment_list[:2])
+    
+    assert repeated['treatments'] == optimized['treatments']
+    assert repeated['total_profit'] == optimized['total_profit']
+
+
+@pytest.mark.parametrize('pricing_basis', PRICING_BASES)
+def test_rank_bundles_ignores_repeated_candidates(pricing_basis):
+    model = corporate_model(pricing_basis)
+    treatment_list = model.prices_df['Treatment'].drop_duplicates().tolist()
+    
+    pd.testing.assert_frame_equal(model.rank_bundles(treatment_list + treatment_list[:2], top_k=5),
+                                  model.rank_bundles(treatment_list, top_k=5))
@@ -0,0 +1,77 @@
+"""
+Incremental recomputation: the compute graph and the result cache only recompute what changed.
+Run with `python -m pytest -q` from the package directory.
+"""
+import pandas as pd
+
+from compute_graph import ComputeGraph
+from model import ModelCorporateWellness
+from result_cache import ResultCache, result_cache
+
+
+def test_graph_recomputes_only_nodes_whose_inputs_changed():
+    graph = ComputeGraph()
+    graph.add_node('total', lambda df: df['value'].sum(), ['table'])
+    graph.add_node('scaled', lambda total, factor: total * factor, ['total', 'factor'])
+    graph.add_node('label', lambda name: name.upper(), ['name'])
+
+    graph.set_input('table', pd.DataFrame({'value': [1, 2, 3]}))
+    graph.set_input('factor', 2)
+    graph.set_input('name', 'a')
+    assert (graph.get('scaled'), graph.get('label')) == (12, 'A')
+    assert graph.compute_counts == {'total': 1, 'scaled': 1, 'label': 1}
+
+    # Inputs set again with equal content, e.g. a rerun with an unchanged table, recompute nothing
+    graph.set_input('table', pd.DataFrame({'value': [1, 2, 3]}))
+    graph.set_input('factor', 2)
+    graph.get('scaled')
+    graph.get('label')
+    assert graph.compute_counts == {'total': 1, 'scaled': 1, 'label': 1}
+
+    # A changed input recomputes its dependents only
+    graph.set_input('factor', 3)
+    assert graph.get('scaled') == 18
+    assert graph.compute_counts == {'total': 1, 'scaled': 2, 'label': 1}
+
+    graph.set_input('table', pd.DataFrame({'value': [1, 2, 4]}))
+    assert graph.get('scaled') == 21
+    assert graph.compute_counts == {'total': 2, 'scaled': 3, 'label': 1}
+
+
+def test_result_cache_keys_on_content_and_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value * 10
+
+    assert cache.get_or_compute(('a', pd.DataFrame({'x': [1]})), lambda: compute(1)) == 10
+    # Equal content under another object is a hit
+    assert cache.get_or_compute(('a', pd.DataFrame({'x': [1]})), lambda: compute(1)) == 10
+    assert cache.get_or_compute(('a', pd.DataFrame({'x': [2]})), lambda: compute(2)) == 20
+    assert calls == [1, 2]
+
+    # 'a', [1] was used before 'a', [2], so it is evicted first
+    cache.get_or_compute(('b',), lambda: compute(3))
+    cache.get_or_compute(('a', pd.DataFrame({'x': [2]})), lambda: compute(2))
+    cache.get_or_compute(('a', pd.DataFrame({'x': [1]})), lambda: compute(1))
+    assert calls == [1, 2, 3, 1]
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'size': 2, 'maxsize': 2}
+
+
+def test_model_results_are_reused_until_their_inputs_change():
+    model = ModelCorporateWellness()
+    model.set_pricing_basis('Dr.Riesqi')
+    model.set_parameters(466, 20, model.prices_df['Treatment'].tolist(), 20, 1)
+    result_cache.clear()
+
+    aro = model.calculate_ARO()
+    assert model.calculate_ARO() == aro
+    assert result_cache.stats()['hits'] >= 1
+
+    # An edited price is a new input, and gives a new result
+    misses = result_cache.stats()['misses']
+    model.prices_df = model.prices_df.assign(**{'Price (Rp.)': model.prices_df['Price (Rp.)'] * 2})
+    assert model.calculate_ARO() == 2 * aro
+    assert result_cache.stats()['misses'] > misses
@@ -0,0 +1,71 @@
+"""
+Parity of the vectorized sensitivity sweep with the original loop over the grid, which is kept here
+as the reference implementation. Run with `python -m pytest -q` from the package directory.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from model import ModelCorporateWellness, sweep_bounds
+
+
+def reference_sensitivity_analysis(model, variables, increments):
+    # The original loop, with every variable bounded by its sweep_bounds
+    initial_values = {
+        "Conversion Rate (%)": model.conversion_rate,
+        "Discount Package (%)": model.discount_package,
+        "Total Potential Employee": model.total_potential_employee
+    }
+
+    value_arrays = {}
+    for i, var in enumerate(variables):
+        initial_value = initial_values[var]
+        increment = increments[i]
+        lower, upper = sweep_bounds(var)
+        up_values = [initial_value + increment * n for n in range(1, 11)
+                     if upper is None or initial_value + increment * n <= upper]
+        down_values = [initial_value - increment * n for n in range(1, 11) if initial_value - increment * n >= lower]
+        value_arrays[var] = sorted(down_values + [initial_value] + up_values)
+
+    results = []
+    for value1 in value_arrays[variables[0]]:
+        for value2 in value_arrays[variables[1]]:
+            parameters = dict(initial_values, **{variables[0]: value1, variables[1]: value2})
+            model.set_parameters(parameters["Total Potential Employee"], parameters["Conversion Rate (%)"], model.treatments,
+                                 parameters["Discount Package (%)"], model.subscription_length)
+
+            first_aro_revenue = model.calculate_ARO()
+            total_dsp_aro, total_dsp_cost, _ = model.calculate_DSP(model.dsp_df, model.total_joining_employee)
+            total_revenue = first_aro_revenue + total_dsp_aro
+
+            first_cost = round(model.calculate_total_cost(), 0)
+            total_cost = round(first_cost + total_dsp_cost, 0)
+
+            results.append([value1, value2, total_revenue, total_cost, total_revenue - total_cost])
+
+    return pd.DataFrame(results, columns=[variables[0], variables[1], 'Total Revenue', 'Total Cost', 'Total Profit'])
+
+
+@pytest.mark.parametrize('pricing_basis', ['Dr.Riesqi', 'GAIA Indonesia'])
+@pytest.mark.parametrize('variables, increments', [
+    (["Conversion Rate (%)", "Discount Package (%)"], [5, 5]),
+    (["Discount Package (%)", "Total Potential Employee"], [7, 50]),
+    (["Total Potential Employee", "Conversion Rate (%)"], [100, 3])
+])
+def test_sensitivity_analysis_matches_loop(pricing_basis, variables, increments):
+    model = ModelCorporateWellness()
+    model.set_pricing_basis(pricing_basis)
+    model.dsp_df = model.dsp_df.assign(Selected=True)
+    model.set_parameters(466, 20, model.prices_df['Treatment'].tolist(), 20, 2)
+
+    _, results_df = model.run_sensitivity_analysis(variables, increments)
+
+    reference_model = ModelCorporateWellness()
+    reference_model.set_pricing_basis(pricing_basis)
+    reference_model.dsp_df = model.dsp_df
+    reference_model.set_parameters(466, 20, model.treatments, 20, 2)
+    expected_df = reference_sensitivity_analysis(reference_model, variables, increments)
+
+    pd.testing.assert_frame_equal(results_df[expected_df.columns].astype(float), expected_df.astype(float),
+                                  check_exact=False, rtol=1e-12)
+    np.testing.assert_array_equal(results_df[variables].to_numpy(), expected_df[variables].to_numpy())
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from result_cache import result_cache
+
+# Columns of every unit economics table, per treatment unit
+UNIT_ECONOMICS_COLUMNS = ['Price (Rp.)', 'Material Cost (Rp.)', 'Dentist Fee (Rp.)', 'Sedation Cost (Rp.)',
+                          'Duration (Hours)', 'Unit Cost (Rp.)', 'Margin (Rp.)']
+
+# Unit economics column of each outreach cost component (see ModelOutreach.COST_COMPONENTS)
+OUTREACH_COST_COLUMNS = {'Cost Material (Rp.)': 'Material Cost (Rp.)', 'Dentist Fee (Rp.)': 'Dentist Fee (Rp.)',
+                         'Sedation Cost (Rp.)': 'Sedation Cost (Rp.)'}
+
+
+def dentist_fee(fee_per_hour, duration_min):
+    """
+    Dentist fee of a treatment from the hourly fee and the treatment duration in minutes.
+    """
+    return fee_per_hour * (duration_min / 60)
+
+
+def _table(index, price, material_cost, fee, sedation_cost, duration_hours, cost_columns=None):
+    table = pd.DataFrame({
+        'Price (Rp.)': price,
+        'Material Cost (Rp.)': material_cost,
+        'Dentist Fee (Rp.)': fee,
+        'Sedation Cost (Rp.)': sedation_cost,
+        'Duration (Hours)': duration_hours
+    }, index=index).astype(float)
+
+    # Unit cost as the sum of the cost columns, in order
+    unit_cost = 0
+    for column in cost_columns or ['Material Cost (Rp.)', 'Dentist Fee (Rp.)', 'Sedation Cost (Rp.)']:
+        unit_cost = unit_cost + table[column]
+    table['Unit Cost (Rp.)'] = unit_cost
+    table['Margin (Rp.)'] = table['Price (Rp.)'] - table['Unit Cost (Rp.)']
+
+    return table[UNIT_ECONOMICS_COLUMNS]
+
+
+def corporate_unit_economics(prices_df, costs_df):
+    """
+    Monthly price and cost per employee of each corporate wellness treatment and cost component
+    (e.g. the member card), indexed by name. Rows sharing a name are summed, so the price of
+    treatments without a cost row, and the cost of components without a price, are 0. The member
+    card fee itself is read from its first row, see ModelCorporateWellness._card_fee.
+    """
+    prices = prices_df.groupby('Treatment', sort=False)['Price (Rp.)'].sum()
+
+    duration_hours = costs_df['Duration (Min)'] / 60
+    costs = pd.DataFrame({
+        'material_cost': costs_df['Material Cost (Rp.)'],
+        'dentist_fee': dentist_fee(costs_df['Dentist Fee per Hour (Rp.)'], costs_df['Duration (Min)']),
+        'duration_hours': duration_hours
+    }).groupby(costs_df['Component'], sort=False).sum()
+
+    # Priced treatments first, then the components that only have a cost
+    index = pd.Index(prices.index.tolist() + [name for name in costs.index if name not in prices.index], name='Treatment')
+    prices = prices.reindex(index, fill_value=0)
+    costs = costs.reindex(index, fill_value=0)
+
+    return _table(index, prices, costs['material_cost'], costs['dentist_fee'], 0, costs['duration_hours'])
+
+
+def dsp_unit_economics(dsp_df):
+    """
+    Original price and cost per customer of each Dental Saving Plan treatment, indexed by name.
+    The first row of a treatment name is used, so ModelCorporateWellness passes the selected rows only.
+    """
+    first_rows = dsp_df.drop_duplicates('Treatment').set_index('Treatment')
+
+    return _table(first_rows.index, first_rows['Original Price (Rp.)'], first_rows['Cost Material (Rp.)'],
+                  dentist_fee(first_rows['Dentist Fee Per Hour (Rp.)'], first_rows['Duration (Min)']), 0,
+                  first_rows['Duration (Min)'] / 60)
+
+
+def school_unit_economics(treatment_prices_df):
+    """
+    Original price and cost of each school outreach treatment, indexed by (Treatment, Category).
+    The first row of each (Treatment, Category) is used, as in the package joins.
+    """
+    first_rows = treatment_prices_df.drop_duplicates(subset=['Treatment', 'Category']).set_index(['Treatment', 'Category'])
+
+    return _table(first_rows.index, first_rows['Original Price (Rp.)'], first_rows['Cost Material (Rp.)'],
+                  dentist_fee(first_rows['Dentist Fee per Hour'], first_rows['total_duration']), 0,
+                  first_rows['total_duration'] / 60)
+
+
+def outreach_unit_economics(treatment_prices_df, cost_components):
+    """
+    Original price and cost of each outreach treatment row, indexed by name, with the unit cost
+    summed over the given cost components (columns of the treatment prices).
+    """
+    # Components the program does not have cost nothing
+    columns = {OUTREACH_COST_COLUMNS[component]: treatment_prices_df[component].to_numpy(dtype=float)
+               for component in cost_components}
+
+    return _table(pd.Index(treatment_prices_df['Treatment'], name='Treatment'),
+                  treatment_prices_df['Original Price (Rp.)'].to_numpy(dtype=float),
+                  columns.get('Material Cost (Rp.)', 0), columns.get('Dentist Fee (Rp.)', 0),
+                  columns.get('Sedation Cost (Rp.)', 0), np.nan,
+                  [OUTREACH_COST_COLUMNS[component] for component in cost_components])
+
+
+UNIT_ECONOMICS_BUILDERS = {
+    'corporate': corporate_unit_economics,
+    'dsp': dsp_unit_economics,
+    'school': school_unit_economics,
+    'outreach': outreach_unit_economics
+}
+
+
+def unit_economics_table(kind, *frames):
+    """
+    Unit economics table of the given kind built from the given data, once per distinct content
+    and shared by every model and session through result_cache. The table is shared, so it
+    must not be modified.
+    :param kind: One of UNIT_ECONOMICS_BUILDERS.
+    :param frames: Arguments of the builder, e.g. the treatment prices and costs for 'corporate'.
+    """
+    builder = UNIT_ECONOMICS_BUILDERS[kind]
+    return result_cache.get_or_compute(('unit_economics', kind) + frames, lambda: builder(*frames))
+
+
+def selection_vector(table, names):
+    """
+    0/1 vector over the table rows, 1 for the rows whose name is among names.
+    """
+    return table.index.isin(names).astype(float)